@@ -0,0 +1,270 @@
+import argparse
+import json
+import math
+import os
+import time
+import zlib
+
+import numpy as np
+
+from pipeline import MOVE, ROT, create_renderer, initial_state, load_scene, parse_resolution
+from pacing import format_pacing, parse_pacing
+from profiler import Profiler
+
+# Headless benchmark: drives every backend offscreen with a scripted
+# transform sequence and no frame cap, e.g.
+#   python benchmark.py --shape square --frames 200 --script orbit
+
+BACKEND_NAMES = ["cpu", "multicore", "multicore-threads", "vectorized", "numba", "gpu"]
+
+# backends with a worker pool, benchmarked per core count with --cores
+POOL_BACKENDS = ["multicore", "multicore-threads"]
+
+# ================= SCRIPTS =================
+# A script is one (dx, dy, dangle) step per frame, in the same pixel/radian
+# units the interactive loops apply per key press.
+def make_script(name, frames):
+    steps = []
+    for i in range(frames):
+        if name == "static":
+            steps.append((0.0, 0.0, 0.0))
+        elif name == "spin":
+            steps.append((0.0, 0.0, ROT))
+        elif name == "orbit":
+            t = 2 * math.pi * i / max(frames, 1)
+            steps.append((MOVE * math.cos(t), MOVE * math.sin(t), ROT))
+        elif name == "keys":
+            # right, down, left, up in 30-frame legs, rotating on every other leg
+            leg = (i // 30) % 4
+            dx, dy = [(MOVE, 0), (0, MOVE), (-MOVE, 0), (0, -MOVE)][leg]
+            steps.append((dx, dy, ROT if leg % 2 else 0.0))
+        else:
+            raise ValueError(f"unknown script: {name}")
+    return steps
+
+# ================= HARNESS =================
+# With profile_dir, per-stage timings of the measured frames are written
+# there as <backend>_stages.json and <backend>_trace.json (Chrome trace).
+# Extra options go to the renderer's constructor and are kept in the result.
+# full_redraw turns off damage tracking, so every frame is drawn from scratch.
+# With a pacing spec (see pacing.py) frames are paced as in the interactive
+# loops, with script steps as simulation ticks, and the pacer's report is
+# kept under "pacing"; without one frames run back to back.
+def bench_backend(name, shape_name, script, warmup=3, profile_dir=None, full_redraw=False,
+                  pacing=None, **options):
+    try:
+        renderer = create_renderer(name, load_scene(shape_name), **options)
+    except Exception as e:
+        return {"backend": name, "options": options, "skipped": f"{type(e).__name__}: {e}"}
+
+    with renderer:
+        renderer.tracker.enabled = not full_redraw
+        state = initial_state()
+
+        for _ in range(warmup):
+            renderer.render(state)
+
+        profiler = None
+        if profile_dir:
+            renderer.profiler = profiler = Profiler()
+
+        frame_times = []
+        redrawn = 0
+        checksum = 0
+        culled = dict(renderer.culled)
+        cache = renderer.geometry_cache
+        hits, misses = cache.hits, cache.misses
+        pacer = parse_pacing(pacing) if pacing else None
+        t_start = time.perf_counter()
+
+        step = 0
+        while step < len(script):
+            ticks = pacer.begin_frame() if pacer else 1
+            for dx, dy, dangle in script[step:step + ticks]:
+                state.pos[0] += dx
+                state.pos[1] += dy
+                state.angle += dangle
+            step += ticks
+
+            t0 = time.perf_counter()
+            frame = renderer.render(state)
+            frame_times.append(time.perf_counter() - t0)
+
+            if renderer.damage:
+                x0, x1, y0, y1 = renderer.damage
+                redrawn += (x1 - x0) * (y1 - y0)
+
+            checksum = zlib.crc32(np.ascontiguousarray(frame).tobytes(), checksum)
+            if pacer:
+                with renderer.profiler.stage("wait"):
+                    pacer.wait()
+            renderer.profiler.end_frame()
+
+        total = time.perf_counter() - t_start
+        stats = renderer.stats()
+        culled = {k: renderer.culled[k] - culled[k] for k in culled}
+        hits, misses = cache.hits - hits, cache.misses - misses
+
+    ms = np.array(frame_times) * 1000
+    result = {
+        "backend": name,
+        "options": options,
+        "frames": len(frame_times),
+        "avg_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "throughput_fps": len(frame_times) / total,
+        "redrawn": redrawn / (renderer.width * renderer.height * len(frame_times)),  # mean fraction
+        "checksum": f"{checksum:08x}",
+    }
+    if stats:
+        result["stats"] = stats
+    # cull stage counters over the timed frames, for backends that have one
+    if culled["submitted"]:
+        result["culled"] = culled
+    # geometry cache lookups over the timed frames, for backends that transform on the CPU
+    if hits + misses:
+        result["geometry_cache"] = {"hits": hits, "misses": misses}
+    if pacer:
+        result["pacing"] = pacer.report()
+    if profiler:
+        label = "_".join([name] + [f"{k}{v}" for k, v in options.items()])
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.to_json(os.path.join(profile_dir, f"{label}_stages.json"))
+        profiler.to_chrome_trace(os.path.join(profile_dir, f"{label}_trace.json"), process_name=label)
+        result["stages"] = {k: v["mean_ms"] for k, v in profiler.summary().items()}
+    return result
+
+# cores, if given, is a list of worker counts to run every pool backend with;
+# gpu_options go to the gpu backend's constructor and render_options (width,
+# height, samples, fixed_point, cull_backfaces, geometry_cache) to every
+# backend's.
+def run_benchmark(shape_name, frames, script_name, backends=BACKEND_NAMES, warmup=3,
+                  profile_dir=None, cores=None, full_redraw=False, gpu_options=None,
+                  pacing=None, **render_options):
+    script = make_script(script_name, frames)
+    results = []
+    for name in backends:
+        options = dict(render_options)
+        if name == "gpu" and gpu_options:
+            options.update(gpu_options)
+
+        if cores and name in POOL_BACKENDS:
+            results += [bench_backend(name, shape_name, script, warmup, profile_dir,
+                                      full_redraw, pacing, cores=n, **options)
+                        for n in cores]
+        else:
+            results.append(bench_backend(name, shape_name, script, warmup, profile_dir,
+                                         full_redraw, pacing, **options))
+    return results
+
+def print_results(results):
+    print(f"{'backend':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}"
+          f"{'redrawn':>9}  checksum")
+    for r in results:
+        label = r["backend"]
+        options = r.get("options", {})
+        if "cores" in options:
+            label += f" x{options['cores']}"
+        if "width" in options:
+            label += f" {options['width']}x{options['height']}"
+        if options.get("samples", 1) > 1:
+            label += f" {options['samples']}xAA"
+        label += "".join(f" {k}" for k in ("latency", "stream") if options.get(k))
+        if options.get("fixed_point"):
+            label += " fixed"
+        if options.get("cull_backfaces") is False:
+            label += " two-sided"
+        if "geometry_cache" in options:
+            label += f" cache{options['geometry_cache']}"
+
+        if "skipped" in r:
+            print(f"{label:<34}skipped ({r['skipped']})")
+            continue
+        print(f"{label:<34}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['throughput_fps']:>10.1f}{r['redrawn']:>9.0%}"
+              f"  {r['checksum']}")
+        if "imbalance" in r.get("stats", {}):
+            print(f"{'':<34}worker imbalance {r['stats']['imbalance']:.2f}x "
+                  f"(tiles {r['stats']['tiles']})")
+        if "culled" in r:
+            c = r["culled"]
+            dropped = c["degenerate"] + c["backface"] + c["offscreen"]
+            print(f"{'':<34}culled {dropped / c['submitted']:.0%} of {c['submitted']} triangles: "
+                  f"degenerate {c['degenerate']}, backface {c['backface']}, "
+                  f"offscreen {c['offscreen']}; clipped {c['clipped']}")
+        if "geometry_cache" in r:
+            g = r["geometry_cache"]
+            print(f"{'':<34}geometry cache {g['hits'] / (g['hits'] + g['misses']):.0%} hits "
+                  f"({g['hits']} hits, {g['misses']} misses)")
+        if "pacing" in r:
+            print(f"{'':<34}{format_pacing(r['pacing'])}")
+        if "gpu_ms" in r.get("stats", {}):
+            print(f"{'':<34}gpu {r['stats']['gpu_ms']:.3f} ms/frame, "
+                  f"cpu submit {r['stats']['submit_ms']:.3f} ms/frame")
+        if "stages" in r:
+            print(f"{'':<34}" + "  ".join(f"{k} {v:.2f}" for k, v in r["stages"].items()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless renderer benchmark")
+    parser.add_argument("--shape", default="square",
+                        help="triangle, square, rectangle or a scene spec such as soup:5000,overdraw=4 "
+                             "or instances:2000,shape=square")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--script", default="orbit", choices=["static", "spin", "orbit", "keys"])
+    parser.add_argument("--backends", default=",".join(BACKEND_NAMES))
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write per-stage timings and Chrome traces to this directory")
+    parser.add_argument("--cores",
+                        help="comma-separated worker counts for the multicore backends, e.g. 1,2,4")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="redraw every frame in full instead of only the changed rect")
+    parser.add_argument("--gpu-latency", action="store_true",
+                        help="finish every gpu frame before timing it ends")
+    parser.add_argument("--gpu-stream", action="store_true",
+                        help="re-upload the gpu per-instance buffer every frame")
+    parser.add_argument("--resolution", help="output size for every backend, e.g. 1920x1080")
+    parser.add_argument("--samples", type=int, default=1, help="samples per pixel: 1, 2 or 4")
+    parser.add_argument("--fixed-point", action="store_true",
+                        help="rasterize in 28.4 fixed point with the top-left rule (CPU backends)")
+    parser.add_argument("--no-backface-cull", action="store_true",
+                        help="draw back-facing triangles too")
+    parser.add_argument("--geometry-cache", type=int, metavar="N",
+                        help="geometry cache entries per renderer, 0 to disable")
+    parser.add_argument("--pacing",
+                        help="pace frames as capped:<hz>, uncapped[:<hz>] or fixed:<hz> "
+                             "instead of running them back to back")
+    args = parser.parse_args(argv)
+
+    gpu_options = {k: True for k, on in (("latency", args.gpu_latency),
+                                         ("stream", args.gpu_stream)) if on}
+    render_options = {}
+    if args.resolution:
+        render_options["width"], render_options["height"] = parse_resolution(args.resolution)
+    if args.samples > 1:
+        render_options["samples"] = args.samples
+    if args.fixed_point:
+        render_options["fixed_point"] = True
+    if args.no_backface_cull:
+        render_options["cull_backfaces"] = False
+    if args.geometry_cache is not None:
+        render_options["geometry_cache"] = args.geometry_cache
+
+    results = run_benchmark(
+        args.shape, args.frames, args.script,
+        backends=args.backends.split(","), warmup=args.warmup, profile_dir=args.profile,
+        cores=[int(n) for n in args.cores.split(",")] if args.cores else None,
+        full_redraw=args.full_redraw, gpu_options=gpu_options, pacing=args.pacing,
+        **render_options
+    )
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"shape": args.shape, "script": args.script, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,16 @@
 import pygame
 import numpy as np
-import time
 import math
 
-W, H = 800, 600
-WHITE = (255, 255, 255)
-RED = (220, 60, 60)
-BG = (30, 30, 30)
+from depth import DepthBuffer
+from interactive import run_interactive
+from pacing import DEFAULT_PACING
+from pipeline import WHITE, BG, FULL_FRAME, Renderer, edge, load_scene, register_backend
 
-VERTEX_COLORS = np.array([
-    [255, 0, 0],   # Red
-    [0, 255, 0],   # Green
-    [0, 0, 255]    # Blue
-], dtype=float)
-
-# ================= SHAPES =================
+# ================= LINES =================
 # uses bresenham line algorithm
-def draw_line_cpu(surface, x0, y0, x1, y1, color):
+def draw_line_cpu(framebuffer, x0, y0, x1, y1, color):
+    height, width = framebuffer.shape[:2]
     x0, y0 = int(x0), int(y0)
     x1, y1 = int(x1), int(y1)
 
@@ -27,8 +21,8 @@ def draw_line_cpu(surface, x0, y0, x1, y1, color):
     err = dx - dy
 
     while True:
-        if 0 <= x0 < W and 0 <= y0 < H:
-            surface.set_at((x0, y0), color)
+        if 0 <= x0 < width and 0 <= y0 < height:
+            framebuffer[y0, x0] = color
 
         if x0 == x1 and y0 == y1:
             break
@@ -41,184 +35,228 @@ def draw_line_cpu(surface, x0, y0, x1, y1, color):
             err += dx
             y0 += sy
 
-def get_shape(shape):
-    if shape == "triangle":
-        return np.array([
-            [-50, -50],
-            [ 50, -50],
-            [  0,  50]
-        ], dtype=float)
-
-    if shape == "square":
-        return np.array([
-            [-50, -50], [ 50, -50], [ 50,  50],
-            [-50, -50], [ 50,  50], [-50,  50]
-        ], dtype=float)
-
-    if shape == "rectangle":
-        return np.array([
-            [-70, -40], [ 70, -40], [ 70,  40],
-            [-70, -40], [ 70,  40], [-70,  40]
-        ], dtype=float)
-
 # ================= CPU RASTERIZATION =================
-def edge(a, b, c):
-    return (c[0] - a[0]) * (b[1] - a[1]) - (c[1] - a[1]) * (b[0] - a[0])
-
-def draw_triangle_cpu(surface, depth, v0, v1, v2, c0, c1, c2):
-    minx = max(int(min(v0[0], v1[0], v2[0])), 0)
-    maxx = min(int(max(v0[0], v1[0], v2[0])), W - 1)
-    miny = max(int(min(v0[1], v1[1], v2[1])), 0)
-    maxy = min(int(max(v0[1], v1[1], v2[1])), H - 1)
-
+# Edge functions are affine in the pixel position, so everything the pixel
+# loop needs (coverage span, depth, colour) is set up once per triangle and
+# then stepped with additions along x and y.
+#
+# depth is a DepthBuffer; triangles behind everything already drawn in all
+# the depth tiles they overlap are rejected before any pixel work.
+# Only pixels inside clip (x0, x1, y0, y1) are drawn.
+def draw_triangle_cpu(framebuffer, depth, v0, v1, v2, c0, c1, c2, clip=FULL_FRAME):
+    cx0, cx1, cy0, cy1 = clip
+    minx = max(int(min(v0[0], v1[0], v2[0])), cx0)
+    maxx = min(int(max(v0[0], v1[0], v2[0])), cx1 - 1)
+    miny = max(int(min(v0[1], v1[1], v2[1])), cy0)
+    maxy = min(int(max(v0[1], v1[1], v2[1])), cy1 - 1)
+    if minx > maxx or miny > maxy:
+        return
+
+    area = float(edge(v0, v1, v2))
+    if area == 0:
+        return
+
+    # e(x, y) = e(minx, miny) + (x - minx) * a + (y - miny) * b
+    p = (minx, miny)
+    edges = [
+        (float(edge(v1, v2, p)), float(v2[1] - v1[1]), float(v1[0] - v2[0])),
+        (float(edge(v2, v0, p)), float(v0[1] - v2[1]), float(v2[0] - v0[0])),
+        (float(edge(v0, v1, p)), float(v1[1] - v0[1]), float(v0[0] - v1[0])),
+    ]
+
+    # flip clockwise triangles so "inside" is always e >= 0 on all edges
+    if area < 0:
+        area = -area
+        edges = [(-e, -a, -b) for e, a, b in edges]
+
+    fill_spans(framebuffer, depth, (minx, maxx, miny, maxy), edges, area,
+               (v0[2], v1[2], v2[2]), (c0, c1, c2))
+
+# Fixed-point version: the same loop on exact integer edges, sampled at pixel
+# centres with the top-left rule. bounds are the triangle's fixed_bounds and
+# dx, dy, c, bias, area its fixed_edges rows, as Python ints.
+def draw_triangle_fixed(framebuffer, depth, bounds, dx, dy, c, bias, area, zs, c0, c1, c2):
+    minx, maxx, miny, maxy = bounds
+    if minx > maxx or miny > maxy or area == 0:
+        return
+
+    edges = [(dx[i] * minx + dy[i] * miny + c[i], dx[i], dy[i]) for i in range(3)]
+    fill_spans(framebuffer, depth, bounds, edges, area, zs, (c0, c1, c2),
+               span=fixed_span, bias=bias)
+
+# Offsets i in [0, last] of a row where e + i * a >= t, as [lo, hi].
+def float_span(e, a, t, last):
+    if a > 0:
+        return max(math.ceil(-e / a), 0), last
+    if a < 0:
+        return 0, min(math.floor(e / -a), last)
+    return (0, last) if e >= 0 else (0, -1)
+
+# The same for integer edges, by floor division: exact, no float rounding.
+def fixed_span(e, a, t, last):
+    if a > 0:
+        return max(-((e - t) // a), 0), last
+    if a < 0:
+        return 0, min((e - t) // -a, last)
+    return (0, last) if e >= t else (0, -1)
+
+# Shared pixel loop. edges are three (e, a, b): e at (minx, miny), stepped
+# by a along x and b along y, with barycentric weight e / area. A row's
+# covered span is where every edge's e >= its bias (float edges: 0).
+def fill_spans(framebuffer, depth, bounds, edges, area, zs, colors, span=float_span,
+               bias=(0, 0, 0)):
+    minx, maxx, miny, maxy = bounds
+    rect = (minx, maxx + 1, miny, maxy + 1)
+    if depth.occluded(*rect, min(zs)):
+        return
+    depth.touch(*rect)
+    zbuf = depth.z
+
+    (e0, a0, b0), (e1, a1, b1), (e2, a2, b2) = edges
+    t0, t1, t2 = bias
+    inv_area = 1.0 / area
+    c0, c1, c2 = colors
+
+    # barycentric-interpolated attributes share the same affine form
+    def setup(q0, q1, q2):
+        q0, q1, q2 = float(q0), float(q1), float(q2)
+        return (
+            (e0 * q0 + e1 * q1 + e2 * q2) * inv_area,
+            (a0 * q0 + a1 * q1 + a2 * q2) * inv_area,
+            (b0 * q0 + b1 * q1 + b2 * q2) * inv_area,
+        )
+
+    z_row, z_dx, z_dy = setup(*zs)
+    r_row, r_dx, r_dy = setup(c0[0], c1[0], c2[0])
+    g_row, g_dx, g_dy = setup(c0[1], c1[1], c2[1])
+    bl_row, bl_dx, bl_dy = setup(c0[2], c1[2], c2[2])
+
+    last = maxx - minx
     for y in range(miny, maxy + 1):
-        for x in range(minx, maxx + 1):
-            p = (x, y)
-
-            e0 = edge(v1, v2, p)
-            e1 = edge(v2, v0, p)
-            e2 = edge(v0, v1, p)
-
-            if ((e0 >= 0 and e1 >= 0 and e2 >= 0) or
-                (e0 <= 0 and e1 <= 0 and e2 <= 0)):
-
-                w0, w1, w2 = barycentric(v0, v1, v2, p)
-
-                z = w0*v0[2] + w1*v1[2] + w2*v2[2]
-
-                if z < depth[x, y]:
-                    depth[x, y] = z
-
-                    color = (
-                        w0*c0 +
-                        w1*c1 +
-                        w2*c2
-                    ).astype(int)
-
-                    surface.set_at((x, y), color)
-
-def draw_wireframe_cpu(surface, v0, v1, v2):
-    draw_line_cpu(surface, v0[0], v0[1], v1[0], v1[1], WHITE)
-    draw_line_cpu(surface, v1[0], v1[1], v2[0], v2[1], WHITE)
-    draw_line_cpu(surface, v2[0], v2[1], v0[0], v0[1], WHITE)
-
-# ================= MAIN CPU LOOP =================
-def run_cpu(shape_name):
-    pygame.init()
-    screen = pygame.display.set_mode((W, H))
-    pygame.display.set_caption("CPU MODE (Pure Software Rasterizer)")
-
-    render_mode = 0
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont("consolas", 18)
-
-    verts = get_shape(shape_name)
-    pos = np.array([W // 2, H // 2], dtype=float)
-    angle = 0.0
-
-    MOVE = 4
-    ROT = 0.08
-
-    frame_times = []
-
-    button_rect = pygame.Rect(W - 210, H - 60, 190, 40)
-
-    running = True
-    switch_to_multicore = False
-
-    depth_buffer = np.full((W, H), np.inf, dtype=float)
-
-    while running:
-        t0 = time.perf_counter()
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
-                running = False
-            if e.type == pygame.MOUSEBUTTONDOWN:
-                if button_rect.collidepoint(e.pos):
-                    switch_to_multicore = True
-                    running = False
-            if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_m:
-                    render_mode = (render_mode + 1) % 3
-
-
-        depth_buffer.fill(np.inf)
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  pos[0] -= MOVE
-        if keys[pygame.K_RIGHT]: pos[0] += MOVE
-        if keys[pygame.K_UP]:    pos[1] -= MOVE
-        if keys[pygame.K_DOWN]:  pos[1] += MOVE
-        if keys[pygame.K_r]:     angle += ROT
+        # covered span [lo, hi] (offsets from minx) inside all three edges
+        lo, hi = 0, last
+        for e, a, t in ((e0, a0, t0), (e1, a1, t1), (e2, a2, t2)):
+            l, h = span(e, a, t, last)
+            lo, hi = max(lo, l), min(hi, h)
+
+        if lo <= hi:
+            z = z_row + lo * z_dx
+            r = r_row + lo * r_dx
+            g = g_row + lo * g_dx
+            bl = bl_row + lo * bl_dx
+
+            # the span's depths as Python floats: cheaper to test per pixel
+            # than float32 scalars, written back once per row
+            x0 = minx + lo
+            zspan = zbuf[y, x0:minx + hi + 1].tolist()
+            for i in range(len(zspan)):
+                if z < zspan[i]:
+                    zspan[i] = z
+                    framebuffer[y, x0 + i] = (int(r), int(g), int(bl))
+
+                z += z_dx
+                r += r_dx
+                g += g_dx
+                bl += bl_dx
+            zbuf[y, x0:minx + hi + 1] = zspan
+
+        e0 += b0
+        e1 += b1
+        e2 += b2
+        z_row += z_dy
+        r_row += r_dy
+        g_row += g_dy
+        bl_row += bl_dy
+
+    depth.update(*rect)
+
+def draw_wireframe_cpu(framebuffer, v0, v1, v2):
+    draw_line_cpu(framebuffer, v0[0], v0[1], v1[0], v1[1], WHITE)
+    draw_line_cpu(framebuffer, v1[0], v1[1], v2[0], v2[1], WHITE)
+    draw_line_cpu(framebuffer, v2[0], v2[1], v0[0], v0[1], WHITE)
+
+# ================= RENDERER =================
+@register_backend("cpu")
+class CPURenderer(Renderer):
+    def __init__(self, scene, **options):
+        super().__init__(scene, **options)
+        self.framebuffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.depth_buffer = DepthBuffer(self.width, self.height)
+
+    def render(self, state):
+        profiler = self.profiler
+        if self.tracker.unchanged(state):
+            self.damage = None
+            return self.framebuffer
 
         # ===== Vertex Transform (CPU) =====
-        c, s = math.cos(angle), math.sin(angle)
-        R = np.array([[c, -s], [s, c]])
-        transformed = np.hstack([
-            (verts @ R.T) + pos,
-            np.zeros((len(verts), 1))
-        ])
-
-
-        screen.fill(BG)
-
-        # ===== Rasterization =====
-        for i in range(0, len(transformed), 3):
-            v0 = transformed[i]
-            v1 = transformed[i + 1]
-            v2 = transformed[i + 2]
-
-            c0 = VERTEX_COLORS[0]
-            c1 = VERTEX_COLORS[1]
-            c2 = VERTEX_COLORS[2]
-
-            if render_mode == 1:
-                # ✅ PURE CPU wireframe
-                draw_wireframe_cpu(screen, v0, v1, v2)
-
-            else:
-                # ✅ PURE CPU filled / overdraw
-                draw_triangle_cpu(
-                    screen,
-                    depth_buffer,
-                    v0, v1, v2,
-                    c0, c1, c2
-                )
-
-
-        # ===== UI =====
-        fps = clock.get_fps()
-        screen.blit(font.render(f"CPU MODE | FPS: {fps:.1f}", True, WHITE), (10, 10))
-        screen.blit(font.render("Pure Software Pipeline", True, WHITE), (10, 30))
-
-        pygame.draw.rect(screen, (70, 200, 70), button_rect)
-        screen.blit(font.render("Switch to Multicore", True, WHITE),
-            (button_rect.x + 10, button_rect.y + 10))
-
-
-        pygame.display.flip()
-        clock.tick(60)
-
-        frame_times.append(time.perf_counter() - t0)
-
-    pygame.quit()
-
-    avg_ms = sum(frame_times) / len(frame_times) * 1000
-    avg_fps = 1000 / avg_ms
-
-    return {
-        "action": "multicore" if switch_to_multicore else "exit",
-        "avg_ms": avg_ms,
-        "avg_fps": avg_fps
-    }
-
-def barycentric(v0, v1, v2, p):
-    area = edge(v0, v1, v2)
-    w0 = edge(v1, v2, p) / area
-    w1 = edge(v2, v0, p) / area
-    w2 = edge(v0, v1, p) / area
-    return w0, w1, w2
+        with profiler.stage("transform"):
+            transformed = self.to_screen(state)
+            colors = self.scene.vertex_colors
+
+        self.damage = rect = self.tracker.update(state, transformed)
+        if rect is None:
+            return self.framebuffer
+        x0, x1, y0, y1 = rect
+        transformed, colors = self.cull(transformed, rect, colors)
+
+        def draw(points):
+            with profiler.stage("setup"):
+                self.depth_buffer.clear(rect)
+                self.framebuffer[y0:y1, x0:x1] = BG
+
+                fixed = self.fixed_point and state.render_mode != 1
+                if fixed:
+                    # integer edges of every triangle at once, as Python ints
+                    p, *edges, bounds = self.fixed_setup(points.reshape(-1, 3, 3), rect)
+                    setup = [a.tolist() for a in (*edges, np.stack(bounds, axis=1))]
+
+            # ===== Rasterization =====
+            with profiler.stage("raster"):
+                for i in range(0, len(points), 3):
+                    v0 = points[i]
+                    v1 = points[i + 1]
+                    v2 = points[i + 2]
+
+                    if state.render_mode == 1:
+                        # ✅ PURE CPU wireframe
+                        draw_wireframe_cpu(self.framebuffer, v0, v1, v2)
+
+                    elif fixed:
+                        dx, dy, c, bias, area, bounds = (a[i // 3] for a in setup)
+                        draw_triangle_fixed(
+                            self.framebuffer,
+                            self.depth_buffer,
+                            bounds, dx, dy, c, bias, area,
+                            (v0[2], v1[2], v2[2]),
+                            colors[i], colors[i + 1], colors[i + 2]
+                        )
+
+                    else:
+                        # ✅ PURE CPU filled / overdraw
+                        draw_triangle_cpu(
+                            self.framebuffer,
+                            self.depth_buffer,
+                            v0, v1, v2,
+                            colors[i], colors[i + 1], colors[i + 2],
+                            clip=rect
+                        )
+
+        self.draw_samples(self.framebuffer[y0:y1, x0:x1], transformed, draw)
+        return self.framebuffer
 
+# ================= MAIN CPU LOOP =================
+def run_cpu(shape_name, pacing=DEFAULT_PACING):
+    def cycle_mode(key, renderer, state):
+        if key == pygame.K_m:
+            state.render_mode = (state.render_mode + 1) % 3
+
+    return run_interactive(
+        CPURenderer(load_scene(shape_name)),
+        caption="CPU MODE (Pure Software Rasterizer)",
+        title="CPU MODE",
+        lines=lambda renderer, state: ["Pure Software Pipeline"],
+        button=("Switch to Multicore", (70, 200, 70), "multicore"),
+        on_key=cycle_mode,
+        pacing=pacing,
+    )
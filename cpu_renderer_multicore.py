@@ -1,188 +1,456 @@
-import pygame
+import itertools
 import numpy as np
 import time
-import math
-from multiprocessing import Process, Array, cpu_count
-
-W, H = 800, 600
-WHITE = (255, 255, 255)
-BG = (30, 30, 30)
-
-def edge(a, b, c):
-    return (c[0] - a[0]) * (b[1] - a[1]) - (c[1] - a[1]) * (b[0] - a[0])
-
-def point_in_triangle(p, v0, v1, v2):
-    e0 = edge(v0, v1, p)
-    e1 = edge(v1, v2, p)
-    e2 = edge(v2, v0, p)
-
-    # inside if all have same sign
-    return ((e0 >= 0 and e1 >= 0 and e2 >= 0) or
-            (e0 <= 0 and e1 <= 0 and e2 <= 0))
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process, Pipe, Value, cpu_count, shared_memory
+
+from cpu_renderer_vectorized import (
+    BatchSetup, CoverageScratch, bin_tiles, raster_batch_tile, triangle_bounds
+)
+from depth import DepthBuffer, TILE as DEPTH_TILE
+from framebuffer import TILE as FRAME_TILE, TiledFramebuffer
+from interactive import run_interactive
+from pacing import DEFAULT_PACING
+from pipeline import (
+    W, H, BG, DIRTY_ALIGN, Renderer, edge, load_scene, register_backend
+)
+
+TILE = 64
+
+# a raster tile must cover whole depth tiles so workers never share one, lie
+# inside one framebuffer tile, and dirty rects must cover whole raster tiles
+assert TILE % DEPTH_TILE == 0
+assert FRAME_TILE % TILE == 0
+assert DIRTY_ALIGN % TILE == 0
 
 # We can’t share a pygame.Surface, so we share raw pixel memory.
-def make_shared_buffer():
-    # RGB buffer
-    return Array('B', W * H * 3, lock=False)
-
-# Index helper
-def set_pixel(buf, x, y, color):
-    idx = (y * W + x) * 3
-    buf[idx]     = color[0]
-    buf[idx + 1] = color[1]
-    buf[idx + 2] = color[2]
-
-# Worker rasterizer (runs in parallel)
-# Each process gets:
-# tile bounds
-# transformed vertices
-# shared buffer
-def raster_worker(tile_y0, tile_y1, triangles, buffer):
-    for v0, v1, v2, color in triangles:
-        minx = max(int(min(v0[0], v1[0], v2[0])), 0)
-        maxx = min(int(max(v0[0], v1[0], v2[0])), W - 1)
+def make_shared_buffer(nbytes):
+    return shared_memory.SharedMemory(create=True, size=nbytes)
+
+# ================= TILE RASTERIZER =================
+# A frame reaches the workers as a dict of arrays: the bins from the
+# vectorized bin_tiles (tile_x, tile_y, ids, starts, ends, TILE x TILE tiles
+# in submission order) and per-triangle rows, indexed by ids:
+#
+#   float   tris (N, 3, 3) screen-space [x, y, z], colors (N, 3, 3)
+#   fixed   bounds (N, 4) fixed_bounds, dx, dy, c, bias (N, 3) fixed_edges,
+#           area (N,), zs (N, 3), colors (N, 3, 3)
+#
+# Each tile call gets its bounds, the ids binned to it, the frame, the
+# tile's pixels (a framebuffer view, indexed from the tile's corner) and the
+# shared depth buffer.
+#
+# Rows are evaluated as NumPy vectors. Triangles are convex, so the covered
+# pixels of a row form one contiguous span that is shaded and written as a
+# slice. The depth tile bounds reject hidden triangles for the whole tile and
+# skip the per-pixel compare where a triangle is in front of everything.
+def raster_tile(tile_x0, tile_x1, tile_y0, tile_y1, ids, frame, pixels, depth):
+    tris, tri_colors = frame["tris"], frame["colors"]
+    for t in ids:
+        v0, v1, v2 = tris[t]
+        area = edge(v0, v1, v2)
+        if area == 0:
+            continue
+
+        minx = max(int(min(v0[0], v1[0], v2[0])), tile_x0)
+        maxx = min(int(max(v0[0], v1[0], v2[0])), tile_x1 - 1)
         miny = max(int(min(v0[1], v1[1], v2[1])), tile_y0)
         maxy = min(int(max(v0[1], v1[1], v2[1])), tile_y1 - 1)
 
-        for y in range(miny, maxy + 1):
-            for x in range(minx, maxx + 1):
-                # simple edge test
-                if point_in_triangle((x, y), v0, v1, v2):
-                    set_pixel(buffer, x, y, color)
-
-def get_shape(shape):
-    if shape == "triangle":
-        return np.array([
-            [-50, -50],
-            [ 50, -50],
-            [  0,  50]
-        ], dtype=float)
-
-    if shape == "square":
-        return np.array([
-            [-50, -50], [ 50, -50], [ 50,  50],
-            [-50, -50], [ 50,  50], [-50,  50]
-        ], dtype=float)
-
-    if shape == "rectangle":
-        return np.array([
-            [-70, -40], [ 70, -40], [ 70,  40],
-            [-70, -40], [ 70,  40], [-70,  40]
-        ], dtype=float)
-
-def run_cpu_multicore(shape_name):
-    pos = np.array([W // 2, H // 2], dtype=float)
-    angle = 0.0
-
-    MOVE = 4
-    ROT = 0.08
-
-    pygame.init()
-    screen = pygame.display.set_mode((W, H))
-    pygame.display.set_caption("CPU MULTICORE MODE")
-
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont("consolas", 18)
-
-    verts = get_shape(shape_name)
-    pos = np.array([W // 2, H // 2], dtype=float)
-    angle = 0.0
-
-    buffer = make_shared_buffer()
-
-    cores = min(cpu_count(), 4)  # limit for sanity
-    tile_height = H // cores
-
-    frame_times = []
-    running = True
-
-    while running:
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  pos[0] -= MOVE
-        if keys[pygame.K_RIGHT]: pos[0] += MOVE
-        if keys[pygame.K_UP]:    pos[1] -= MOVE
-        if keys[pygame.K_DOWN]:  pos[1] += MOVE
-        if keys[pygame.K_r]:     angle += ROT
-
-        t0 = time.perf_counter()
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
+        zs = tris[t, :, 2]
+        rect = (minx, maxx + 1, miny, maxy + 1)
+        if depth.occluded(*rect, zs.min()):
+            continue
+        front = depth.unoccluded(*rect, zs.max())
+        zbuf = depth.touch(*rect)
 
-        # clear buffer
-        for i in range(len(buffer)):
-            buffer[i] = 0
+        xs = np.arange(minx, maxx + 1)
+        colors = tri_colors[t]
 
-        # vertex transform
-        c, s = math.cos(angle), math.sin(angle)
-        R = np.array([[c, -s], [s, c]])
-        transformed = (verts @ R.T) + pos
-
-        triangles = []
-        for i in range(0, len(transformed), 3):
-            triangles.append((
-                transformed[i],
-                transformed[i+1],
-                transformed[i+2],
-                (220, 60, 60)
-            ))
-
-        # spawn workers
-        workers = []
-        for i in range(cores):
-            y0 = i * tile_height
-            y1 = H if i == cores - 1 else (i + 1) * tile_height
+        for y in range(miny, maxy + 1):
+            p = (xs, y)
+            # barycentric weights; inside where all three are >= 0
+            w = np.array([edge(v1, v2, p), edge(v2, v0, p), edge(v0, v1, p)]) / area
+            inside = np.flatnonzero((w >= 0).all(axis=0))
+            if len(inside) == 0:
+                continue
+
+            lo, hi = inside[0], inside[-1] + 1
+            write_span(pixels[y - tile_y0], zbuf[y - miny], minx - tile_x0, lo, hi, w[:, lo:hi],
+                       zs, colors, front)
+
+        depth.update(*rect)
+
+# Fixed-point version on the fixed arrays. A row's three integer edges are
+# stepped to the next row with one integer add. Weights are e * (1 / area),
+# exactly as the other fixed-point kernels compute them, so the backends
+# agree bit for bit.
+def raster_tile_fixed(tile_x0, tile_x1, tile_y0, tile_y1, ids, frame, pixels, depth):
+    for t in ids:
+        bounds, area = frame["bounds"][t], frame["area"][t]
+        dx, dy, c, bias = (frame[k][t] for k in ("dx", "dy", "c", "bias"))
+        zs, colors = frame["zs"][t], frame["colors"][t]
+
+        minx = max(bounds[0], tile_x0)
+        maxx = min(bounds[1], tile_x1 - 1)
+        miny = max(bounds[2], tile_y0)
+        maxy = min(bounds[3], tile_y1 - 1)
+        if minx > maxx or miny > maxy or area == 0:
+            continue
+
+        rect = (minx, maxx + 1, miny, maxy + 1)
+        if depth.occluded(*rect, zs.min()):
+            continue
+        front = depth.unoccluded(*rect, zs.max())
+        zbuf = depth.touch(*rect)
+
+        inv_area = 1.0 / area
+        xs = np.arange(minx, maxx + 1)
+        e = dx[:, None] * xs + (dy * miny + c)[:, None]
+        for y in range(miny, maxy + 1):
+            inside = np.flatnonzero((e >= bias[:, None]).all(axis=0))
+            if len(inside):
+                lo, hi = inside[0], inside[-1] + 1
+                w = e[:, lo:hi] * inv_area
+                write_span(pixels[y - tile_y0], zbuf[y - miny], minx - tile_x0, lo, hi, w, zs,
+                           colors, front)
+            e += dy[:, None]
+
+        depth.update(*rect)
+
+# Depth-test and shade one row's covered span [minx + lo, minx + hi) of the
+# pixel row row from its barycentric weights w (3, hi - lo). zrow is the row
+# of the touched depth rect; front skips the compare.
+def write_span(row, zrow, minx, lo, hi, w, zs, colors, front):
+    span = slice(minx + lo, minx + hi)
+    zrow = zrow[lo:hi]
+
+    z = zs @ w
+    if not front:
+        closer = z < zrow
+        if not closer.all():
+            if closer.any():
+                zrow[closer] = z[closer]
+                row[span][closer] = (w[:, closer].T @ colors).astype(np.uint8)
+            return
+
+    zrow[:] = z
+    row[span] = (w.T @ colors).astype(np.uint8)
+
+# Rasterize bin k of a frame.
+def raster_bin(k, frame, framebuffer, depth, fixed=False):
+    raster = raster_tile_fixed if fixed else raster_tile
+    tx, ty = int(frame["tile_x"][k]), int(frame["tile_y"][k])
+    rect = (tx * TILE, min((tx + 1) * TILE, framebuffer.width),
+            ty * TILE, min((ty + 1) * TILE, framebuffer.height))
+    ids = frame["ids"][frame["starts"][k]:frame["ends"][k]]
+    raster(*rect, ids, frame, framebuffer.view(*rect), depth)
+
+# ================= TILE SCHEDULER =================
+# Every worker, process or thread, keeps claiming the next unclaimed tile
+# until none are left, so fast workers pick up the slack of slow ones.
+# claim() returns the next tile index and raster(i, *args) draws tile i of
+# count. Returns (busy seconds, tiles done).
+def raster_claimed(claim, count, raster, *args):
+    busy = 0.0
+    tiles = 0
+    while True:
+        i = claim()
+        if i >= count:
+            break
 
+        t0 = time.perf_counter()
+        raster(i, *args)
+        busy += time.perf_counter() - t0
+        tiles += 1
+
+    return busy, tiles
+
+# ================= FRAME SEGMENT =================
+# A frame's arrays reach the worker processes through shared memory rather
+# than the pipe: the parent copies them into one segment and sends each
+# worker a token, (segment name, layout, fixed), where the layout is each
+# array's key, dtype and shape. Signalling a frame then costs the same few
+# hundred bytes whatever the triangle count. A frame that outgrows the
+# segment replaces it with one at least twice the size, and workers
+# reattach when the token names a new segment.
+FRAME_BYTES = 1 << 20  # first segment size
+
+def frame_layout(frame):
+    return [(key, a.dtype.str, a.shape) for key, a in frame.items()]
+
+# The arrays of a layout as views of buf, each 8-byte aligned.
+def frame_views(buf, layout):
+    frame, offset = {}, 0
+    for key, dtype, shape in layout:
+        frame[key] = a = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        offset += -(-a.nbytes // 8) * 8
+    return frame
+
+def frame_nbytes(layout):
+    return sum(-(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+               for key, dtype, shape in layout)
+
+# Long-lived worker process: attaches to the shared buffers once, then
+# claims tiles from the shared cursor every frame.
+def pool_worker(color_name, depth_name, width, height, cursor, conn):
+    color_shm = shared_memory.SharedMemory(name=color_name)
+    depth_shm = shared_memory.SharedMemory(name=depth_name)
+    framebuffer = TiledFramebuffer(width, height, buffer=color_shm.buf, init=False)
+    depth = DepthBuffer(width, height, buffer=depth_shm.buf, init=False)
+    frame_shm = None
+
+    def claim():
+        with cursor.get_lock():
+            i = cursor.value
+            cursor.value += 1
+        return i
+
+    while True:
+        token = conn.recv()
+        if token is None:
+            break
+        name, layout, fixed = token
+        if frame_shm is None or frame_shm.name != name:
+            if frame_shm is not None:
+                frame_shm.close()
+            frame_shm = shared_memory.SharedMemory(name=name)
+
+        frame = frame_views(frame_shm.buf, layout)
+        conn.send(raster_claimed(claim, len(frame["starts"]), raster_bin, frame, framebuffer,
+                                 depth, fixed))
+        del frame
+
+    del framebuffer, depth
+    for shm in (color_shm, depth_shm, frame_shm):
+        if shm is not None:
+            shm.close()
+
+# ================= WORKER LOAD =================
+# What both pools report: per-worker busy seconds and tiles rasterized, for
+# the last frame and in total.
+class WorkerLoad:
+    def __init__(self, cores=None):
+        self.cores = cores or cpu_count()
+        self.frame_stats = [(0.0, 0)] * self.cores
+        self.busy_total = [0.0] * self.cores
+        self.tiles_total = [0] * self.cores
+
+    # frame_stats is one (busy seconds, tiles) per worker, from raster_claimed.
+    def record(self, frame_stats):
+        self.frame_stats = frame_stats
+        for i, (busy, tiles) in enumerate(frame_stats):
+            self.busy_total[i] += busy
+            self.tiles_total[i] += tiles
+
+    # Cumulative per-worker load; imbalance is max / mean busy time.
+    def worker_stats(self):
+        busy_ms = [b * 1000 for b in self.busy_total]
+        mean = sum(busy_ms) / len(busy_ms)
+        return {
+            "busy_ms": busy_ms,
+            "tiles": list(self.tiles_total),
+            "imbalance": max(busy_ms) / mean if mean > 0 else 1.0,
+        }
+
+# ================= WORKER POOL =================
+# Workers are started once and kept alive across frames; a frame costs a
+# copy into the frame segment and one small send/recv per worker instead of
+# a process spawn + join.
+class RasterPool(WorkerLoad):
+    def __init__(self, cores=None, width=W, height=H):
+        super().__init__(cores)
+        self.color_shm = make_shared_buffer(TiledFramebuffer.nbytes(width, height))
+        self.depth_shm = make_shared_buffer(DepthBuffer.nbytes(width, height))
+        self.framebuffer = TiledFramebuffer(width, height, buffer=self.color_shm.buf)
+        self.depth = DepthBuffer(width, height, buffer=self.depth_shm.buf)
+        self.cursor = Value("i", 0)
+        self.frame_shm = None
+
+        self.conns = []
+        self.workers = []
+        for _ in range(self.cores):
+            parent_conn, child_conn = Pipe()
             p = Process(
-                target=raster_worker,
-                args=(y0, y1, triangles, buffer)
+                target=pool_worker,
+                args=(self.color_shm.name, self.depth_shm.name, width, height,
+                      self.cursor, child_conn),
+                daemon=True
             )
-            workers.append(p)
             p.start()
+            self.conns.append(parent_conn)
+            self.workers.append(p)
+
+    # Bin a frame of tris, colors (N, 3, 3) clipped to clip and copy it into
+    # the frame segment (see TILE RASTERIZER); fixed is the triangles'
+    # Renderer.fixed_setup, or None.
+    def prepare(self, tris, colors, clip, fixed=None):
+        if fixed is not None:
+            p, dx, dy, c, bias, area, bounds = fixed
+            frame = {"bounds": np.stack(bounds, axis=1), "dx": dx, "dy": dy, "c": c,
+                     "bias": bias, "area": area, "zs": tris[..., 2]}
+        else:
+            bounds = triangle_bounds(tris, clip)
+            frame = {"tris": tris}
+        frame["colors"] = colors
+        frame.update(zip(("tile_x", "tile_y", "ids", "starts", "ends"),
+                         bin_tiles(*bounds, tile=TILE)))
+
+        layout = frame_layout(frame)
+        nbytes = frame_nbytes(layout)
+        if self.frame_shm is None or self.frame_shm.size < nbytes:
+            self.grow_frame(nbytes)
+        for key, view in frame_views(self.frame_shm.buf, layout).items():
+            view[...] = frame[key]
+        self.token = (self.frame_shm.name, layout, fixed is not None)
+
+    # Rasterize the prepared frame.
+    def render(self):
+        self.cursor.value = 0
+        token = self.token
+        for conn in self.conns:
+            conn.send(token)
+
+        self.record([conn.recv() for conn in self.conns])
+
+    # Replace the frame segment with one of at least nbytes. Workers still
+    # mapping the old one keep it until they see the new name.
+    def grow_frame(self, nbytes):
+        old = self.frame_shm
+        self.frame_shm = make_shared_buffer(max(nbytes, 2 * old.size if old else FRAME_BYTES))
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    # The segments are unlinked even if a worker has died and its pipe is
+    # broken.
+    def close(self):
+        try:
+            for conn in self.conns:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+            for p in self.workers:
+                p.join()
+        finally:
+            for conn in self.conns:
+                conn.close()
+
+            del self.framebuffer, self.depth
+            for shm in (self.color_shm, self.depth_shm, self.frame_shm):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+# ================= THREAD POOL =================
+# Same tile scheduler on threads: one process, one framebuffer and depth
+# buffer written in place, nothing copied. A thread draws each tile it
+# claims with the vectorized backend's whole-tile kernel, raster_batch_tile:
+# a handful of (T, 3, h, w) array operations over every triangle in the
+# tile, which NumPy runs with the GIL released, so the threads overlap in
+# the kernel rather than queueing on per-row Python. Tiles are the
+# vectorized TILE, one depth tile each, and every thread has its own
+# scratch.
+class ThreadRasterPool(WorkerLoad):
+    def __init__(self, cores=None, width=W, height=H, fixed=False):
+        super().__init__(cores)
+        self.framebuffer = TiledFramebuffer(width, height)
+        self.depth = DepthBuffer(width, height)
+        self.executor = ThreadPoolExecutor(max_workers=self.cores)
+        self.scratch = [CoverageScratch(width=width, height=height, fixed=fixed)
+                        for _ in range(self.cores)]
+
+    def prepare(self, tris, colors, clip, fixed=None):
+        self.setup = BatchSetup(tris, colors, clip=clip, fixed=fixed)
+        self.bins = bin_tiles(*self.setup.bounds)
+
+    def raster_bin(self, k, scratch):
+        tile_x, tile_y, ids, starts, ends = self.bins
+        raster_batch_tile(self.framebuffer, self.depth, self.setup, tile_x[k], tile_y[k],
+                          ids[starts[k]:ends[k]], scratch)
+
+    def render(self):
+        # next() on a count is atomic under the GIL
+        claim = itertools.count().__next__
+        count = len(self.bins[0])
+        futures = [
+            self.executor.submit(raster_claimed, claim, count, self.raster_bin, scratch)
+            for scratch in self.scratch
+        ]
+
+        self.record([f.result() for f in futures])
+
+    def close(self):
+        self.executor.shutdown()
+
+# ================= RENDERER =================
+# threads=True runs the tile workers as threads of this process instead.
+@register_backend("multicore")
+class MulticoreRenderer(Renderer):
+    def __init__(self, scene, cores=None, threads=False, **options):
+        super().__init__(scene, **options)
+        if threads:
+            self.pool = ThreadRasterPool(cores, self.width, self.height, self.fixed_point)
+        else:
+            self.pool = RasterPool(cores, self.width, self.height)
+
+    def render(self, state):
+        profiler = self.profiler
+        if self.tracker.unchanged(state):
+            self.damage = None
+            return self.pool.framebuffer.output
 
-        for p in workers:
-            p.join()
-
-        button_rect = pygame.Rect(W - 210, H - 60, 190, 40)
-        switch_to_vec = False
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
-                running = False
-            if e.type == pygame.MOUSEBUTTONDOWN:
-                if button_rect.collidepoint(e.pos):
-                    switch_to_vec = True
-                    running = False
-
-
-        # blit buffer to screen
-        surf = pygame.image.frombuffer(buffer, (W, H), "RGB")
-        screen.blit(surf, (0, 0))
-
-        fps = clock.get_fps()
-        screen.blit(font.render(f"CPU MULTICORE | FPS: {fps:.1f}", True, WHITE), (10, 10))
-
-        pygame.draw.rect(screen, (200, 70, 70), button_rect)
-        screen.blit(
-            font.render("Switch to Vectorized", True, WHITE),
-            (button_rect.x + 25, button_rect.y + 10)
-        )
-
-        pygame.display.flip()
-        clock.tick(60)
-
-        frame_times.append(time.perf_counter() - t0)
-
-    pygame.quit()
-
-    avg_ms = sum(frame_times) / len(frame_times) * 1000
-    avg_fps = 1000 / avg_ms
-
-    return {
-        "action": "vec" if switch_to_vec else "exit",
-        "avg_ms": avg_ms,
-        "avg_fps": avg_fps
-    }
+        # vertex transform
+        with profiler.stage("transform"):
+            transformed = self.to_screen(state)
+            colors = self.scene.vertex_colors
+
+        self.damage = rect = self.tracker.update(state, transformed)
+        if rect is None:
+            return self.pool.framebuffer.output
+        transformed, colors = self.cull(transformed, rect, colors)
+        colors = np.ascontiguousarray(colors.reshape(-1, 3, 3), dtype=float)
+
+        def draw(points):
+            # clear the dirty rect + bin
+            with profiler.stage("setup"):
+                self.pool.framebuffer.clear(rect, BG)
+                self.pool.depth.clear(rect)
+                tris = points.reshape(-1, 3, 3)
+                fixed = self.fixed_setup(tris, rect) if self.fixed_point else None
+                self.pool.prepare(tris, colors, rect, fixed)
+
+            with profiler.stage("raster"):
+                self.pool.render()
+
+        self.draw_samples(self.pool.framebuffer.block(rect), transformed, draw)
+        with profiler.stage("output"):
+            return self.pool.framebuffer.resolve(rect)
+
+    def stats(self):
+        return self.pool.worker_stats()
+
+    def close(self):
+        self.pool.close()
+
+@register_backend("multicore-threads")
+class ThreadedRenderer(MulticoreRenderer):
+    def __init__(self, scene, cores=None, **options):
+        super().__init__(scene, cores, threads=True, **options)
+
+# ================= MAIN MULTICORE LOOP =================
+def run_cpu_multicore(shape_name, pacing=DEFAULT_PACING):
+    def worker_load(renderer, state):
+        pool = renderer.pool
+        busy_ms = [busy * 1000 for busy, tiles in pool.frame_stats]
+        return [f"{pool.cores} workers | busy ms max {max(busy_ms):.1f} / mean {sum(busy_ms) / len(busy_ms):.1f}"]
+
+    return run_interactive(
+        MulticoreRenderer(load_scene(shape_name)),
+        caption="CPU MULTICORE MODE",
+        title="CPU MULTICORE",
+        lines=worker_load,
+        button=("Switch to Vectorized", (200, 70, 70), "vec"),
+        pacing=pacing,
+    )
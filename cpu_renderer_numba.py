@@ -0,0 +1,231 @@
+import numpy as np
+
+from cpu_renderer_vectorized import TILE, bin_tiles, triangle_bounds
+from depth import DepthBuffer
+from framebuffer import ALPHA, TILE as FRAME_TILE, TiledFramebuffer
+from interactive import run_interactive
+from pacing import DEFAULT_PACING
+from pipeline import BG, Renderer, load_scene, register_backend
+
+# a raster tile must lie inside one framebuffer tile
+assert FRAME_TILE % TILE == 0
+
+# Numba is optional: without it this module still imports (the kernel is
+# plain Python) but the backend refuses to start, since an interpreted
+# per-pixel loop is slower than every other CPU path.
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+# ================= JIT TILE RASTERIZER =================
+# Gouraud colour from barycentric weights as one packed RGBA word; each
+# channel wraps to a byte like a uint8 store.
+@njit(inline="always", cache=True)
+def pack_pixel(w0, w1, w2, colors):
+    word = ALPHA
+    for c in range(3):
+        value = int(w0 * colors[0, c] + w1 * colors[1, c] + w2 * colors[2, c])
+        word |= (value & 0xFF) << (8 * c)
+    return word
+
+# Same edge-function rasterizer as the other CPU paths, compiled to native
+# code. Tiles come from the vectorized binner and are independent, so prange
+# spreads them across threads; each tile resets its own depth pixels (the
+# DepthBuffer's lazy clear) and records its zmin/zmax when done.
+#
+#   tris    (N, 3, 3) screen-space [x, y, z]
+#   colors  (N, 3, 3) per-vertex colour, 0..255
+#   pixels  the TiledFramebuffer's packed tiles; a raster tile lies inside
+#           one framebuffer tile, so all its writes go to one 16 KiB block
+#           with a single 32-bit store per pixel
+@njit(parallel=True, nogil=True, cache=True)
+def raster_tiles(tris, colors, tile_x, tile_y, ids, starts, ends,
+                 pixels, depth, zmin, zmax, cleared, tile):
+    height, width = depth.shape
+    frame_tile = pixels.shape[2]
+
+    for k in prange(len(starts)):
+        tx, ty = tile_x[k], tile_y[k]
+        tx0, ty0 = tx * tile, ty * tile
+        tx1, ty1 = min(tx0 + tile, width), min(ty0 + tile, height)
+        out = pixels[ty0 // frame_tile, tx0 // frame_tile]
+        ox, oy = tx0 - tx0 % frame_tile, ty0 - ty0 % frame_tile
+
+        for y in range(ty0, ty1):
+            for x in range(tx0, tx1):
+                depth[y, x] = np.inf
+
+        for j in range(starts[k], ends[k]):
+            t = ids[j]
+            x0, y0, z0 = tris[t, 0, 0], tris[t, 0, 1], tris[t, 0, 2]
+            x1, y1, z1 = tris[t, 1, 0], tris[t, 1, 1], tris[t, 1, 2]
+            x2, y2, z2 = tris[t, 2, 0], tris[t, 2, 1], tris[t, 2, 2]
+
+            area = (x2 - x0) * (y1 - y0) - (y2 - y0) * (x1 - x0)
+            if area == 0:
+                continue
+            inv_area = 1.0 / area
+
+            minx = max(int(min(x0, x1, x2)), tx0)
+            maxx = min(int(max(x0, x1, x2)), tx1 - 1)
+            miny = max(int(min(y0, y1, y2)), ty0)
+            maxy = min(int(max(y0, y1, y2)), ty1 - 1)
+
+            for y in range(miny, maxy + 1):
+                for x in range(minx, maxx + 1):
+                    # barycentric weights; inside where all three are >= 0
+                    w0 = ((x - x1) * (y2 - y1) - (y - y1) * (x2 - x1)) * inv_area
+                    w1 = ((x - x2) * (y0 - y2) - (y - y2) * (x0 - x2)) * inv_area
+                    w2 = ((x - x0) * (y1 - y0) - (y - y0) * (x1 - x0)) * inv_area
+                    if w0 < 0 or w1 < 0 or w2 < 0:
+                        continue
+
+                    z = w0 * z0 + w1 * z1 + w2 * z2
+                    if z < depth[y, x]:
+                        depth[y, x] = z
+                        out[y - oy, x - ox] = pack_pixel(w0, w1, w2, colors[t])
+
+        lo, hi = np.inf, -np.inf
+        for y in range(ty0, ty1):
+            for x in range(tx0, tx1):
+                lo = min(lo, depth[y, x])
+                hi = max(hi, depth[y, x])
+        zmin[ty, tx] = lo
+        zmax[ty, tx] = hi
+        cleared[ty, tx] = False
+
+# Fixed-point version: integer edges from fixed_edges, e = dx * x + dy * y + c,
+# stepped with integer adds along x and y; a pixel is covered where every
+# e >= bias. bounds is (N, 4) fixed_bounds rows.
+@njit(parallel=True, nogil=True, cache=True)
+def raster_tiles_fixed(dx, dy, c, bias, area, bounds, zs, colors, tile_x, tile_y, ids,
+                       starts, ends, pixels, depth, zmin, zmax, cleared, tile):
+    height, width = depth.shape
+    frame_tile = pixels.shape[2]
+
+    for k in prange(len(starts)):
+        tx, ty = tile_x[k], tile_y[k]
+        tx0, ty0 = tx * tile, ty * tile
+        tx1, ty1 = min(tx0 + tile, width), min(ty0 + tile, height)
+        out = pixels[ty0 // frame_tile, tx0 // frame_tile]
+        ox, oy = tx0 - tx0 % frame_tile, ty0 - ty0 % frame_tile
+
+        for y in range(ty0, ty1):
+            for x in range(tx0, tx1):
+                depth[y, x] = np.inf
+
+        for j in range(starts[k], ends[k]):
+            t = ids[j]
+            if area[t] == 0:
+                continue
+            inv_area = 1.0 / area[t]
+
+            minx, maxx = max(bounds[t, 0], tx0), min(bounds[t, 1], tx1 - 1)
+            miny, maxy = max(bounds[t, 2], ty0), min(bounds[t, 3], ty1 - 1)
+
+            # edge values at the rect's first pixel
+            r0 = dx[t, 0] * minx + dy[t, 0] * miny + c[t, 0]
+            r1 = dx[t, 1] * minx + dy[t, 1] * miny + c[t, 1]
+            r2 = dx[t, 2] * minx + dy[t, 2] * miny + c[t, 2]
+
+            for y in range(miny, maxy + 1):
+                e0, e1, e2 = r0, r1, r2
+                for x in range(minx, maxx + 1):
+                    if e0 >= bias[t, 0] and e1 >= bias[t, 1] and e2 >= bias[t, 2]:
+                        w0, w1, w2 = e0 * inv_area, e1 * inv_area, e2 * inv_area
+                        z = w0 * zs[t, 0] + w1 * zs[t, 1] + w2 * zs[t, 2]
+                        if z < depth[y, x]:
+                            depth[y, x] = z
+                            out[y - oy, x - ox] = pack_pixel(w0, w1, w2, colors[t])
+                    e0 += dx[t, 0]
+                    e1 += dx[t, 1]
+                    e2 += dx[t, 2]
+                r0 += dy[t, 0]
+                r1 += dy[t, 1]
+                r2 += dy[t, 2]
+
+        lo, hi = np.inf, -np.inf
+        for y in range(ty0, ty1):
+            for x in range(tx0, tx1):
+                lo = min(lo, depth[y, x])
+                hi = max(hi, depth[y, x])
+        zmin[ty, tx] = lo
+        zmax[ty, tx] = hi
+        cleared[ty, tx] = False
+
+# ================= RENDERER =================
+@register_backend("numba")
+class NumbaRenderer(Renderer):
+    def __init__(self, scene, **options):
+        if not HAVE_NUMBA:
+            raise ImportError("the numba backend needs numba (pip install numba)")
+        super().__init__(scene, **options)
+        self.framebuffer = TiledFramebuffer(self.width, self.height)
+        self.depth_buffer = DepthBuffer(self.width, self.height, tile=TILE)
+
+    def render(self, state):
+        profiler = self.profiler
+        depth = self.depth_buffer
+        if self.tracker.unchanged(state):
+            self.damage = None
+            return self.framebuffer.output
+
+        with profiler.stage("transform"):
+            transformed = self.to_screen(state)
+
+        self.damage = rect = self.tracker.update(state, transformed)
+        if rect is None:
+            return self.framebuffer.output
+
+        transformed, colors = self.cull(transformed, rect, self.scene.vertex_colors)
+        colors = np.ascontiguousarray(colors.reshape(-1, 3, 3), dtype=float)
+
+        def draw(points):
+            tris = points.reshape(-1, 3, 3)
+            with profiler.stage("setup"):
+                self.framebuffer.clear(rect, BG)
+                depth.clear(rect)
+                if self.fixed_point:
+                    p, *edges, bounds = self.fixed_setup(tris, rect)
+                    tile_x, tile_y, ids, starts, ends = bin_tiles(*bounds)
+                else:
+                    tile_x, tile_y, ids, starts, ends = bin_tiles(*triangle_bounds(tris, rect))
+
+            if self.fixed_point:
+                with profiler.stage("raster"):
+                    raster_tiles_fixed(
+                        *edges, np.stack(bounds, axis=1), tris[..., 2], colors,
+                        tile_x, tile_y, ids, starts, ends,
+                        self.framebuffer.tiles, depth.z, depth.zmin, depth.zmax, depth.cleared,
+                        TILE
+                    )
+                return
+
+            with profiler.stage("raster"):
+                raster_tiles(
+                    tris, colors, tile_x, tile_y, ids, starts, ends,
+                    self.framebuffer.tiles, depth.z, depth.zmin, depth.zmax, depth.cleared, TILE
+                )
+
+        self.draw_samples(self.framebuffer.block(rect), transformed, draw)
+        with profiler.stage("output"):
+            return self.framebuffer.resolve(rect)
+
+# ================= MAIN NUMBA LOOP =================
+def run_cpu_numba(shape_name, pacing=DEFAULT_PACING):
+    import numba
+
+    return run_interactive(
+        NumbaRenderer(load_scene(shape_name)),
+        caption="CPU NUMBA MODE (JIT Rasterizer)",
+        title="NUMBA CPU",
+        lines=lambda renderer, state: [f"JIT tiles | {numba.get_num_threads()} threads"],
+        button=("Switch to GPU", (200, 70, 70), "gpu"),
+        pacing=pacing,
+    )
@@ -1,147 +1,492 @@
 import pygame
 import numpy as np
-import time
-import math
-
-# ================= CONSTANTS =================
-W, H = 800, 600
-WHITE = (255, 255, 255)
-BG = (30, 30, 30)
-
-VERTEX_COLORS = np.array([
-    [255, 0, 0],
-    [0, 255, 0],
-    [0, 0, 255]
-], dtype=np.uint8)
-
-# ================= SHAPES =================
-def get_shape(shape):
-    if shape == "triangle":
-        return np.array([
-            [-50, -50],
-            [ 50, -50],
-            [  0,  50]
-        ], dtype=float)
-
-    if shape == "square":
-        return np.array([
-            [-50, -50], [ 50, -50], [ 50,  50],
-            [-50, -50], [ 50,  50], [-50,  50]
-        ], dtype=float)
-
-    if shape == "rectangle":
-        return np.array([
-            [-70, -40], [ 70, -40], [ 70,  40],
-            [-70, -40], [ 70,  40], [-70,  40]
-        ], dtype=float)
+
+from depth import DepthBuffer, TILE as DEPTH_TILE
+from framebuffer import TILE as FRAME_TILE, TiledFramebuffer
+from interactive import run_interactive
+from pacing import DEFAULT_PACING
+from pipeline import (
+    W, H, BG, DIRTY_ALIGN, FULL_FRAME, SUBPIXEL, Renderer, load_scene, register_backend
+)
+from profiler import NULL_PROFILER
 
 # ================= VECTOR EDGE FUNCTION =================
 def edge(a, b, p):
     return (p[..., 0] - a[0]) * (b[1] - a[1]) - (p[..., 1] - a[1]) * (b[0] - a[0])
 
+# ================= SHADING =================
+# Gouraud colour for covered pixels from their edge values e (..., 3), one
+# per vertex: e * inv_area are the barycentric weights. colors is either one
+# triangle's (3, 3) or a (..., 3, 3) per pixel. With inv_w (1 / clip w per
+# vertex) the weights are made perspective-correct, b_i / w_i renormalized,
+# instead of affine in screen space. Depth always stays affine in screen
+# space, which is correct for post-projection z.
+def shade_pixels(e, inv_area, colors, inv_w=None):
+    b = e * np.asarray(inv_area)[..., None]
+    if inv_w is not None:
+        b *= inv_w
+        b /= b.sum(axis=-1, keepdims=True)
+    if colors.ndim == 2:
+        return (b @ colors).astype(np.uint8)
+    return np.einsum("...k,...kc->...c", b, colors).astype(np.uint8)
+
 # ================= VECTOR RASTERIZER =================
-def draw_triangle_vectorized(surface, v0, v1, v2, color):
-    minx = max(int(min(v0[0], v1[0], v2[0])), 0)
-    maxx = min(int(max(v0[0], v1[0], v2[0])), W - 1)
-    miny = max(int(min(v0[1], v1[1], v2[1])), 0)
-    maxy = min(int(max(v0[1], v1[1], v2[1])), H - 1)
+# Coverage is evaluated one BLOCK x BLOCK piece of the bounding box at a time
+# from 1D x / y ranges broadcast against each other, in scratch arrays that
+# are allocated once, so memory per triangle is fixed whatever its size.
+# Blocks lie on the framebuffer's tile grid, so each one is written through
+# a single tile's view.
+# Blocks are first classified from their corners (edge functions are
+# linear, so their extremes over a block are at its corners): blocks outside
+# an edge are skipped, blocks inside all three need no per-pixel coverage,
+# and a covered block in front of everything in its depth tiles is a plain
+# slice fill.
+#
+# Edges are (ax, ay, dx, dy, c) with e(x, y) = (x - ax) * dy - (y - ay) * dx + c.
+# Float edges have c = 0; fixed-point edges are integer, with ax = ay = 0,
+# and are evaluated in int64 scratch arrays.
+BLOCK = 64
+TILE = 32
+
+# one batched screen tile is exactly one depth tile, so its zmin/zmax apply
+# directly; dirty rects cover whole tiles; blocks and batched tiles each lie
+# inside one framebuffer tile
+assert TILE == DEPTH_TILE
+assert DIRTY_ALIGN % TILE == 0
+assert FRAME_TILE % BLOCK == 0 and FRAME_TILE % TILE == 0
+
+class CoverageScratch:
+    def __init__(self, block=BLOCK, tile=TILE, batch=None, width=W, height=H, fixed=False):
+        self.xs = np.arange(width, dtype=float)
+        self.ys = np.arange(height, dtype=float)
+        self.e = np.empty((3, block, block))
+        self.emin = np.empty((block, block))
+        self.inside = np.empty((block, block), dtype=bool)
+        self.test = np.empty((block, block), dtype=bool)
+        self.z = np.empty((block, block))
+
+        # edge values and their minimum for a whole chunk of the batched path
+        batch = batch or BATCH
+        self.batch_e = np.empty((batch, 3, tile, tile))
+        self.batch_emin = np.empty((batch, tile, tile))
+
+        # integer twins of the above for fixed-point edges; the batched path
+        # also has int32 ones for frames whose edges fit in 32 bits
+        if fixed:
+            self.xi = np.arange(width, dtype=np.int64)
+            self.yi = np.arange(height, dtype=np.int64)
+            self.ei = np.empty((3, block, block), dtype=np.int64)
+            self.batch_ei = {dtype: np.empty((batch, 3, tile, tile), dtype=dtype)
+                             for dtype in (np.int32, np.int64)}
+            self.batch_emini = {dtype: np.empty((batch, tile, tile), dtype=dtype)
+                                for dtype in (np.int32, np.int64)}
+
+# colors is the (3, 3) vertex colours, inv_w the optional (3,) 1 / w. Only
+# pixels inside clip (x0, x1, y0, y1) are drawn.
+def draw_triangle_vectorized(framebuffer, depth, v0, v1, v2, colors, scratch, inv_w=None,
+                             clip=FULL_FRAME):
+    cx0, cx1, cy0, cy1 = clip
+    minx = max(int(min(v0[0], v1[0], v2[0])), cx0)
+    maxx = min(int(max(v0[0], v1[0], v2[0])), cx1 - 1)
+    miny = max(int(min(v0[1], v1[1], v2[1])), cy0)
+    maxy = min(int(max(v0[1], v1[1], v2[1])), cy1 - 1)
 
     if minx > maxx or miny > maxy:
         return
 
-    xs = np.arange(minx, maxx + 1)
-    ys = np.arange(miny, maxy + 1)
-
-    X, Y = np.meshgrid(xs, ys)
-    P = np.stack([X, Y], axis=-1)
+    area = edge(v0, v1, v2)
+    if area == 0:
+        return
 
-    e0 = edge(v1, v2, P)
-    e1 = edge(v2, v0, P)
-    e2 = edge(v0, v1, P)
+    # e(x, y) = (x - ax) * dy - (y - ay) * dx for the edges (v1, v2), (v2, v0),
+    # (v0, v1), scaled by the winding sign so "inside" is all >= 0
+    sign = 1.0 if area > 0 else -1.0
+    edges = [(a[0], a[1], (b[0] - a[0]) * sign, (b[1] - a[1]) * sign, 0)
+             for a, b in ((v1, v2), (v2, v0), (v0, v1))]
+    raster_blocks(framebuffer, depth, (minx, maxx, miny, maxy), edges, None,
+                  (v0[2], v1[2], v2[2]), 1.0 / abs(area), colors, inv_w, scratch)
+
+# Fixed-point version, on the triangle's fixed_bounds and fixed_edges rows.
+def draw_triangle_fixed(framebuffer, depth, bounds, dx, dy, c, bias, area, zs, colors,
+                        scratch, inv_w=None):
+    minx, maxx, miny, maxy = bounds
+    if minx > maxx or miny > maxy or area == 0:
+        return
 
-    mask = ((e0 >= 0) & (e1 >= 0) & (e2 >= 0)) | \
-           ((e0 <= 0) & (e1 <= 0) & (e2 <= 0))
+    edges = [(0, 0, -dy[i], dx[i], c[i]) for i in range(3)]
+    raster_blocks(framebuffer, depth, bounds, edges, bias, zs, 1.0 / area, colors, inv_w,
+                  scratch)
+
+# Covered pixels have e >= bias on every edge; bias None means float edges,
+# covered where e >= 0.
+def raster_blocks(framebuffer, depth, bounds, edges, bias, zs, inv_area, colors, inv_w, scratch):
+    minx, maxx, miny, maxy = bounds
+    flat = zs[0] == zs[1] == zs[2]
+    limits = (0, 0, 0) if bias is None else bias
+
+    for gy in range(miny - miny % BLOCK, maxy + 1, BLOCK):
+        for gx in range(minx - minx % BLOCK, maxx + 1, BLOCK):
+            bx0, by0 = max(gx, minx), max(gy, miny)
+            bx1, by1 = min(gx + BLOCK, maxx + 1), min(gy + BLOCK, maxy + 1)
+
+            inside = True
+            for (ax, ay, dx, dy, c), t in zip(edges, limits):
+                px0, px1 = (bx0 - ax) * dy + c, (bx1 - 1 - ax) * dy + c
+                py0, py1 = (by0 - ay) * dx, (by1 - 1 - ay) * dx
+                if max(px0, px1) - min(py0, py1) < t:
+                    break
+                inside = inside and min(px0, px1) - max(py0, py1) >= t
+            else:
+                rect = (bx0, bx1, by0, by1)
+                if not depth.occluded(*rect, min(zs)):
+                    fill_block(framebuffer, depth, rect, edges, bias, zs, flat, inv_area,
+                               inside, colors, inv_w, scratch)
+
+def fill_block(framebuffer, depth, rect, edges, bias, zs, flat, inv_area, inside, colors, inv_w,
+               scratch):
+    bx0, bx1, by0, by1 = rect
+    h, w = by1 - by0, bx1 - bx0
+    zbuf = depth.touch(*rect)
+    block = framebuffer.view(*rect)
+
+    if bias is None:
+        e = scratch.e[:, :h, :w]
+        xs, ys = scratch.xs[bx0:bx1], scratch.ys[by0:by1]
+    else:
+        e = scratch.ei[:, :h, :w]
+        xs, ys = scratch.xi[bx0:bx1], scratch.yi[by0:by1]
+    for i, (ax, ay, dx, dy, c) in enumerate(edges):
+        np.subtract(((xs - ax) * dy + c)[None, :], ((ys - ay) * dx)[:, None], out=e[i])
+
+    if inside and flat and depth.unoccluded(*rect, zs[0]):
+        block[:] = shade_pixels(e.transpose(1, 2, 0), inv_area, colors, inv_w)
+        zbuf[:] = zs[0]
+        depth.update(*rect)
+        return
 
-    pixels = pygame.surfarray.pixels3d(surface)
-    pixels[X[mask], Y[mask]] = color
+    mask = scratch.inside[:h, :w]
+    if inside:
+        mask[:] = True
+    elif bias is None:
+        np.greater_equal(e.min(axis=0, out=scratch.emin[:h, :w]), 0, out=mask)
+    else:
+        np.greater_equal(e[0], bias[0], out=mask)
+        mask &= e[1] >= bias[1]
+        mask &= e[2] >= bias[2]
+
+    if flat:
+        z = zs[0]
+        mask &= np.less(z, zbuf, out=scratch.test[:h, :w])
+        zbuf[mask] = z
+    else:
+        z = scratch.z[:h, :w]
+        np.multiply(e[0], zs[0] * inv_area, out=z)
+        z += e[1] * (zs[1] * inv_area)
+        z += e[2] * (zs[2] * inv_area)
+        mask &= np.less(z, zbuf, out=scratch.test[:h, :w])
+        zbuf[mask] = z[mask]
+
+    block[mask] = shade_pixels(e[:, mask].T, inv_area, colors, inv_w)
+    depth.update(*rect)
+
+# ================= BATCHED VECTOR RASTERIZER =================
+# Whole-scene path: triangles come in as one (N, 3, 3) array and coverage is
+# evaluated per TILE x TILE screen block for all triangles overlapping it at
+# once, so Python overhead scales with tiles rather than with triangles.
+BATCH = 256  # triangles per coverage evaluation, bounds temporaries per tile
+
+# Integer pixel bounds of each triangle, clipped to clip (x0, x1, y0, y1).
+def triangle_bounds(tris, clip=FULL_FRAME):
+    cx0, cx1, cy0, cy1 = clip
+    lo = tris[..., :2].min(axis=1)
+    hi = tris[..., :2].max(axis=1)
+    minx = np.maximum(lo[:, 0].astype(int), cx0)
+    maxx = np.minimum(hi[:, 0].astype(int), cx1 - 1)
+    miny = np.maximum(lo[:, 1].astype(int), cy0)
+    maxy = np.minimum(hi[:, 1].astype(int), cy1 - 1)
+    return minx, maxx, miny, maxy
+
+# Narrowest integer type that holds every fixed-point edge value a frame of
+# snapped (N, 3, 2) triangles can produce inside clip. An edge value is
+# (P - a) x (b - a) for a pixel centre P and vertices a, b, so it is at
+# most 2 * rx * ry for rx x ry the bounds of all vertices and clip together.
+# NumPy integer arithmetic wraps, so intermediate products may overflow as
+# long as the final values fit.
+def edge_dtype(p, clip):
+    cx0, cx1, cy0, cy1 = np.array(clip) * SUBPIXEL
+    xs = np.r_[p[..., 0].ravel(), cx0, cx1]
+    ys = np.r_[p[..., 1].ravel(), cy0, cy1]
+    rx, ry = int(xs.max() - xs.min()), int(ys.max() - ys.min())
+    return np.int32 if 2 * rx * ry < 2 ** 31 else np.int64
+
+# Pair every triangle with each tile x tile screen tile its bounding box
+# overlaps and group the pairs by tile, as flat arrays: tile k is
+# (tx[k], ty[k]) and owns ids[starts[k]:ends[k]], in submission order. Only
+# non-empty tiles appear.
+def bin_tiles(minx, maxx, miny, maxy, tile=TILE):
+    vis = np.flatnonzero((minx <= maxx) & (miny <= maxy))
+    if len(vis) == 0:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty, empty, empty
+
+    tx0, ty0 = minx[vis] // tile, miny[vis] // tile
+    cols = maxx[vis] // tile - tx0 + 1
+    counts = cols * (maxy[vis] // tile - ty0 + 1)
+
+    ids = np.repeat(vis, counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = np.repeat(cols, counts)
+    tx = np.repeat(tx0, counts) + k % cols
+    ty = np.repeat(ty0, counts) + k // cols
+
+    key = ty * (tx.max() + 1) + tx
+    order = np.argsort(key, kind="stable")
+    key, ids, tx, ty = key[order], ids[order], tx[order], ty[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)]
+    return tx[starts], ty[starts], ids, starts, ends
+
+# Per-triangle setup of the batched path: bounds, edges, depth and 1 / area
+# for all triangles at once. tris is (N, 3, 3) screen-space [x, y, z], colors
+# (N, 3, 3) per vertex and inv_w an optional (N, 3) 1 / w. Bounds are
+# clipped to clip, and degenerate triangles get empty ones.
+#
+# fixed, the triangles' Renderer.fixed_setup, switches to the exact integer
+# fixed_edges with the top-left bias folded into c, so coverage is "e >= 0"
+# either way; the bias is added back before the edges become barycentrics.
+# They are evaluated in int32, half the memory traffic of int64, whenever the
+# results fit (see edge_dtype).
+class BatchSetup:
+    def __init__(self, tris, colors, inv_w=None, clip=FULL_FRAME, fixed=None):
+        self.colors, self.inv_w = colors, inv_w
+        self.fixed = fixed is not None
+        if self.fixed:
+            p, dy, dx, c, self.bias, area, (minx, maxx, miny, maxy) = fixed
+            self.dtype = dtype = edge_dtype(p, clip)
+            self.dx, self.dy = (-dx).astype(dtype), dy.astype(dtype)
+            self.c = (c - self.bias).astype(dtype)
+        else:
+            minx, maxx, miny, maxy = triangle_bounds(tris, clip)
+
+            # edge(a, b, p) = (p.x - a.x) * (b.y - a.y) - (p.y - a.y) * (b.x - a.x)
+            # for the three edges (v1, v2), (v2, v0), (v0, v1) of every triangle.
+            # Scaling by the winding sign makes "inside" all-edges >= 0 either way.
+            a = tris[:, [1, 2, 0]]
+            b = tris[:, [2, 0, 1]]
+            ax, ay = a[..., 0], a[..., 1]
+            dx, dy = b[..., 0] - ax, b[..., 1] - ay
+            area = (tris[:, 2, 0] - ax[:, 2]) * dy[:, 2] - (tris[:, 2, 1] - ay[:, 2]) * dx[:, 2]
+            sign = np.where(area < 0, -1.0, 1.0)[:, None]
+            self.ax, self.ay = ax, ay
+            self.dx, self.dy = dx * sign, dy * sign
+
+        # the normalized edges sum to |area|, so e_i / |area| are barycentrics
+        self.zs = zs = tris[..., 2]
+        self.zmin, self.zmax = zs.min(axis=1), zs.max(axis=1)
+        self.inv_area = np.zeros(len(tris))
+        np.divide(1.0, np.abs(area), out=self.inv_area, where=area != 0)
+
+        # degenerate triangles cover nothing
+        maxx = np.where(area != 0, maxx, -1)
+        self.bounds = minx, maxx, miny, maxy
+
+# Draw the triangles ids (in submission order) of a BatchSetup into the
+# TILE x TILE screen tile (tx, ty). Within a chunk the nearest covering
+# triangle is found per pixel (the earliest one on equal depth), depth-tested
+# against the buffer once, and only the pixels that pass are shaded. The
+# work is a few whole-tile array operations per chunk, which run with the
+# GIL released.
+def raster_batch_tile(framebuffer, depth, setup, tx, ty, ids, scratch):
+    s = setup
+    minx, maxx, miny, maxy = s.bounds
+    zs, zmin, zmax, inv_area = s.zs, s.zmin, s.zmax, s.inv_area
+    dx, dy = s.dx, s.dy
+
+    for start in range(0, len(ids), BATCH):
+        chunk = ids[start:start + BATCH]
+
+        # whole-tile early-Z against what earlier chunks left behind
+        chunk = chunk[zmin[chunk] < depth.zmax[ty, tx]]
+        if len(chunk) == 0:
+            continue
+
+        # only the part of the tile these triangles can touch
+        x0 = max(tx * TILE, minx[chunk].min())
+        x1 = min((tx + 1) * TILE, maxx[chunk].max() + 1)
+        y0 = max(ty * TILE, miny[chunk].min())
+        y1 = min((ty + 1) * TILE, maxy[chunk].max() + 1)
+
+        # (T, 3, 1, w) - (T, 3, h, 1) into scratch: masks come out
+        # row-major like a framebuffer tile
+        T, h, w = len(chunk), y1 - y0, x1 - x0
+        if s.fixed:
+            X = scratch.xi[None, None, None, x0:x1].astype(s.dtype)
+            Y = scratch.yi[None, None, y0:y1, None].astype(s.dtype)
+            e = scratch.batch_ei[s.dtype][:T, :, :h, :w]
+            emin = scratch.batch_emini[s.dtype][:T, :h, :w]
+            np.subtract(X * dy[chunk, :, None, None] + s.c[chunk, :, None, None],
+                        Y * dx[chunk, :, None, None], out=e)
+        else:
+            X = scratch.xs[None, None, None, x0:x1]
+            Y = scratch.ys[None, None, y0:y1, None]
+            e = scratch.batch_e[:T, :, :h, :w]
+            emin = scratch.batch_emin[:T, :h, :w]
+            np.subtract((X - s.ax[chunk, :, None, None]) * dy[chunk, :, None, None],
+                        (Y - s.ay[chunk, :, None, None]) * dx[chunk, :, None, None], out=e)
+
+        inbox = ((X[0] >= minx[chunk, None, None]) & (X[0] <= maxx[chunk, None, None]) &
+                 (Y[0] >= miny[chunk, None, None]) & (Y[0] <= maxy[chunk, None, None]))
+        mask = (e.min(axis=1, out=emin) >= 0) & inbox
+
+        zbuf = depth.touch(x0, x1, y0, y1)
+        tile = framebuffer.view(x0, x1, y0, y1)
+
+        if zmin[chunk].min() == zmax[chunk].max():
+            # one depth for the whole chunk (e.g. any 2D scene): the
+            # earliest covering triangle is the nearest, no z per pixel
+            znear = zmin[chunk[0]]
+            nearest = np.argmax(mask, axis=0)
+            passed = mask.any(axis=0) & (znear < zbuf)
+            zbuf[passed] = znear
+        else:
+            z = np.einsum("tkhw,tk->thw", e, zs[chunk])
+            if s.fixed:
+                z += np.einsum("tk,tk->t", s.bias[chunk], zs[chunk])[:, None, None]
+            z *= inv_area[chunk, None, None]
+            z = np.where(mask, z, np.inf)
+            nearest = np.argmin(z, axis=0)
+            znear = np.take_along_axis(z, nearest[None], axis=0)[0]
+            passed = znear < zbuf
+            zbuf[passed] = znear[passed]
+
+        ys, xs = np.nonzero(passed)
+        t = nearest[ys, xs]
+        shown = chunk[t]
+        weights = e[t, :, ys, xs]
+        if s.fixed:
+            weights = weights + s.bias[shown]
+        tile[passed] = shade_pixels(
+            weights, inv_area[shown], s.colors[shown],
+            None if s.inv_w is None else s.inv_w[shown]
+        )
+        depth.update(x0, x1, y0, y1)
+
+# Whole-scene batched draw: BatchSetup, bin_tiles, then raster_batch_tile
+# per tile. Only pixels inside clip are drawn.
+def draw_triangles_batch(framebuffer, depth, tris, colors, scratch, profiler=NULL_PROFILER,
+                         inv_w=None, clip=FULL_FRAME, fixed=None):
+    with profiler.stage("setup"):
+        setup = BatchSetup(tris, colors, inv_w, clip, fixed)
+        tile_x, tile_y, ids, starts, ends = bin_tiles(*setup.bounds)
+
+    with profiler.stage("raster"):
+        for tx, ty, i, j in zip(tile_x, tile_y, starts, ends):
+            raster_batch_tile(framebuffer, depth, setup, tx, ty, ids[i:j], scratch)
+
+# ================= RENDERER =================
+# Gouraud shaded like the other backends. perspective=True interpolates
+# colour perspective-correctly using the scene's per-vertex clip w; scenes
+# without w are orthographic and render the same either way.
+@register_backend("vectorized")
+class VectorizedRenderer(Renderer):
+    def __init__(self, scene, batch=True, perspective=False, **options):
+        super().__init__(scene, **options)
+        self.batch = batch
+        self.perspective = perspective
+        self.framebuffer = TiledFramebuffer(self.width, self.height)
+        self.depth_buffer = DepthBuffer(self.width, self.height)
+        self.scratch = CoverageScratch(width=self.width, height=self.height,
+                                       fixed=self.fixed_point)
+
+    def render(self, state):
+        profiler = self.profiler
+        if self.tracker.unchanged(state):
+            self.damage = None
+            return self.framebuffer.output
+
+        with profiler.stage("transform"):
+            transformed = self.to_screen(state)
+            inv_w = None
+            if self.perspective and self.scene.w is not None:
+                inv_w = 1.0 / self.scene.w.reshape(-1, 1)
+
+        self.damage = rect = self.tracker.update(state, transformed)
+        if rect is None:
+            return self.framebuffer.output
+
+        transformed, colors, inv_w = self.cull(transformed, rect, self.scene.vertex_colors, inv_w)
+        colors = colors.reshape(-1, 3, 3)
+        if inv_w is not None:
+            inv_w = inv_w.reshape(-1, 3)
+
+        def draw(points):
+            with profiler.stage("setup"):
+                self.framebuffer.clear(rect, BG)
+                self.depth_buffer.clear(rect)
+
+            tris = points.reshape(-1, 3, 3)
+            fixed = None
+            if self.fixed_point:
+                with profiler.stage("setup"):
+                    fixed = self.fixed_setup(tris, rect)
+
+            if self.batch:
+                draw_triangles_batch(self.framebuffer, self.depth_buffer, tris, colors,
+                                     self.scratch, profiler, inv_w, rect, fixed)
+                return
+
+            if self.fixed_point:
+                with profiler.stage("setup"):
+                    p, *edges, bounds = fixed
+                    setup = [a.tolist() for a in (*edges, np.stack(bounds, axis=1))]
+
+            with profiler.stage("raster"):
+                for i in range(0, len(points), 3):
+                    if self.fixed_point:
+                        dx, dy, c, bias, area, bounds = (a[i // 3] for a in setup)
+                        draw_triangle_fixed(
+                            self.framebuffer, self.depth_buffer,
+                            bounds, dx, dy, c, bias, area, tris[i // 3, :, 2], colors[i // 3],
+                            self.scratch, None if inv_w is None else inv_w[i // 3]
+                        )
+                        continue
+
+                    draw_triangle_vectorized(
+                        self.framebuffer,
+                        self.depth_buffer,
+                        points[i],
+                        points[i + 1],
+                        points[i + 2],
+                        colors[i // 3],
+                        self.scratch,
+                        None if inv_w is None else inv_w[i // 3],
+                        clip=rect
+                    )
+
+        self.draw_samples(self.framebuffer.block(rect), transformed, draw)
+        with profiler.stage("output"):
+            return self.framebuffer.resolve(rect)
+
+@register_backend("vectorized-loop")
+class VectorizedLoopRenderer(VectorizedRenderer):
+    def __init__(self, scene, **options):
+        super().__init__(scene, batch=False, **options)
 
 # ================= MAIN VECTOR CPU LOOP =================
-def run_cpu_vectorized(shape_name):
-    pygame.init()
-    screen = pygame.display.set_mode((W, H))
-    pygame.display.set_caption("CPU VECTOR MODE (SIMD-like)")
-
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont("consolas", 18)
-
-    verts = get_shape(shape_name)
-    pos = np.array([W // 2, H // 2], dtype=float)
-    angle = 0.0
-
-    MOVE = 4
-    ROT = 0.08
-
-    frame_times = []
-
-    button_rect = pygame.Rect(W - 210, H - 60, 190, 40)
-    running = True
-    switch_to_gpu = False
-
-    while running:
-        t0 = time.perf_counter()
-
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
-                running = False
-            if e.type == pygame.MOUSEBUTTONDOWN:
-                if button_rect.collidepoint(e.pos):
-                    switch_to_gpu = True
-                    running = False
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  pos[0] -= MOVE
-        if keys[pygame.K_RIGHT]: pos[0] += MOVE
-        if keys[pygame.K_UP]:    pos[1] -= MOVE
-        if keys[pygame.K_DOWN]:  pos[1] += MOVE
-        if keys[pygame.K_r]:     angle += ROT
-
-        c, s = math.cos(angle), math.sin(angle)
-        R = np.array([[c, -s], [s, c]])
-        transformed = (verts @ R.T) + pos
-
-        screen.fill(BG)
-
-        for i in range(0, len(transformed), 3):
-            draw_triangle_vectorized(
-                screen,
-                transformed[i],
-                transformed[i + 1],
-                transformed[i + 2],
-                VERTEX_COLORS[0]
-            )
-
-        fps = clock.get_fps()
-        screen.blit(font.render(f"VECTOR CPU | FPS: {fps:.1f}", True, WHITE), (10, 10))
-        screen.blit(font.render("NumPy SIMD-style Rasterization", True, WHITE), (10, 30))
-
-        pygame.draw.rect(screen, (200, 70, 70), button_rect)
-        screen.blit(font.render("Switch to GPU", True, WHITE),
-                    (button_rect.x + 25, button_rect.y + 10))
-
-        pygame.display.flip()
-        clock.tick(60)
-
-        frame_times.append(time.perf_counter() - t0)
-
-    pygame.quit()
-
-    avg_ms = sum(frame_times) / len(frame_times) * 1000
-    avg_fps = 1000 / avg_ms
-
-    return {
-        "action": "gpu" if switch_to_gpu else "exit",
-        "avg_ms": avg_ms,
-        "avg_fps": avg_fps
-    }
+def run_cpu_vectorized(shape_name, pacing=DEFAULT_PACING):
+    def toggle_batch(key, renderer, state):
+        if key == pygame.K_b:
+            renderer.batch = not renderer.batch
+
+    return run_interactive(
+        VectorizedRenderer(load_scene(shape_name)),
+        caption="CPU VECTOR MODE (SIMD-like)",
+        title="VECTOR CPU",
+        lines=lambda renderer, state: [
+            "NumPy SIMD-style Rasterization",
+            f"[B] {'Batched scene' if renderer.batch else 'Per-triangle'}",
+        ],
+        button=("Switch to GPU", (200, 70, 70), "gpu"),
+        on_key=toggle_batch,
+        pacing=pacing,
+    )
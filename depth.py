@@ -0,0 +1,107 @@
+import numpy as np
+
+from pipeline import W, H
+
+# Shared depth buffer for the software backends. Depth is float32 and
+# row-major (H, W) like the framebuffer, so a row span is one contiguous
+# slice. On top of the pixels it keeps, per TILE x TILE block:
+#
+#   zmin / zmax  bounds of the stored depths, for whole-tile early-Z:
+#                a triangle is rejected where its nearest z >= zmax, and
+#                needs no per-pixel compare where its farthest z < zmin
+#   cleared      tile holds a pending clear; its pixels are only reset to
+#                FAR when something first touches the tile
+#
+# The depth test is "z < stored", so on equal depth the first triangle wins.
+# Pixels are padded out to whole tiles with -inf, which keeps the bounds of
+# partial edge tiles conservative (zmin never rises above a real pixel).
+
+TILE = 32
+FAR = np.float32(np.inf)
+
+class DepthBuffer:
+    def __init__(self, width=W, height=H, tile=TILE, buffer=None, init=True):
+        self.width, self.height, self.tile = width, height, tile
+        self.tiles_x = (width + tile - 1) // tile
+        self.tiles_y = (height + tile - 1) // tile
+
+        # one flat allocation so the whole structure can live in shared memory
+        if buffer is None:
+            buffer = bytearray(self.nbytes(width, height, tile))
+        shape = (self.tiles_y, self.tiles_x)
+        pixels = self.tiles_y * tile * self.tiles_x * tile
+        offset = 0
+        self.storage = np.ndarray((self.tiles_y * tile, self.tiles_x * tile),
+                                  dtype=np.float32, buffer=buffer, offset=offset)
+        offset += pixels * 4
+        self.zmin = np.ndarray(shape, dtype=np.float32, buffer=buffer, offset=offset)
+        offset += self.zmin.nbytes
+        self.zmax = np.ndarray(shape, dtype=np.float32, buffer=buffer, offset=offset)
+        offset += self.zmax.nbytes
+        self.cleared = np.ndarray(shape, dtype=bool, buffer=buffer, offset=offset)
+
+        self.z = self.storage[:height, :width]
+
+        if init:
+            self.storage[:] = -np.inf
+            self.clear()
+
+    @staticmethod
+    def nbytes(width=W, height=H, tile=TILE):
+        tiles = ((width + tile - 1) // tile) * ((height + tile - 1) // tile)
+        return tiles * tile * tile * 4 + tiles * (4 + 4 + 1)
+
+    # O(tiles): pixels are reset lazily by touch(). With a rect, only the
+    # tiles it overlaps are cleared.
+    def clear(self, rect=None):
+        tiles = np.s_[:, :]
+        if rect:
+            tx0, tx1, ty0, ty1 = self.tile_range(*rect)
+            tiles = np.s_[ty0:ty1, tx0:tx1]
+        self.cleared[tiles] = True
+        self.zmin[tiles] = FAR
+        self.zmax[tiles] = FAR
+
+    def tile_range(self, x0, x1, y0, y1):
+        t = self.tile
+        return x0 // t, (x1 - 1) // t + 1, y0 // t, (y1 - 1) // t + 1
+
+    # ================= HIERARCHICAL Z =================
+    # Rects are pixel ranges [x0, x1) x [y0, y1).
+    def occluded(self, x0, x1, y0, y1, zmin):
+        tx0, tx1, ty0, ty1 = self.tile_range(x0, x1, y0, y1)
+        return zmin >= self.zmax[ty0:ty1, tx0:tx1].max()
+
+    def unoccluded(self, x0, x1, y0, y1, zmax):
+        tx0, tx1, ty0, ty1 = self.tile_range(x0, x1, y0, y1)
+        return zmax < self.zmin[ty0:ty1, tx0:tx1].min()
+
+    # ================= PIXELS =================
+    # Resolve pending clears under the rect and return its depth view.
+    def touch(self, x0, x1, y0, y1):
+        tx0, tx1, ty0, ty1 = self.tile_range(x0, x1, y0, y1)
+        pending = self.cleared[ty0:ty1, tx0:tx1]
+        if pending.any():
+            t = self.tile
+            for ty, tx in np.argwhere(pending):
+                ty += ty0
+                tx += tx0
+                self.z[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t] = FAR
+            pending[:] = False
+        return self.z[y0:y1, x0:x1]
+
+    # Recompute the tile bounds under a rect after writing into it.
+    def update(self, x0, x1, y0, y1):
+        tx0, tx1, ty0, ty1 = self.tile_range(x0, x1, y0, y1)
+        t = self.tile
+        block = self.storage[ty0 * t:ty1 * t, tx0 * t:tx1 * t]
+        # gather each tile's pixels into one contiguous row before reducing
+        block = block.reshape(ty1 - ty0, t, tx1 - tx0, t).swapaxes(1, 2)
+        block = block.reshape(ty1 - ty0, tx1 - tx0, t * t)
+        self.zmin[ty0:ty1, tx0:tx1] = block.min(axis=2)
+        self.zmax[ty0:ty1, tx0:tx1] = block.max(axis=2)
+
+    # Full-resolution copy with pending clears applied, for inspection.
+    def resolve(self):
+        self.touch(0, self.width, 0, self.height)
+        return self.z
@@ -0,0 +1,104 @@
+import numpy as np
+
+from pipeline import W, H, DIRTY_ALIGN
+
+# Tiled colour buffer for the software backends. Pixels are packed 32-bit
+# RGBA stored tile-major: every TILE x TILE tile is one contiguous run of
+# TILE * TILE words (16 KiB at 64), so a rasterizer working inside a tile
+# writes to a block that stays in L1/L2, and a tile row is TILE adjacent
+# words instead of a stride across the whole frame.
+#
+#   tiles  (tiles_y, tiles_x, TILE, TILE) uint32, the packed pixels
+#   rgba   the same memory as (tiles_y, tiles_x, TILE, TILE, 4) uint8, bytes
+#          R, G, B, A (the words are packed little-endian, see pack())
+#
+# The frame is padded out to whole tiles. Nothing outside this module reads
+# the tiles in screen order: resolve() is the one swizzle per frame into the
+# row-major (H, W, 3) RGB array pygame, the benchmarks and verify.py expect,
+# and only over the damaged rect. Rects passed in must cover whole tiles
+# except where clipped by the frame, which DIRTY_ALIGN guarantees for the
+# damage tracker's rects.
+
+TILE = 64
+ALPHA = 0xFF000000
+
+assert DIRTY_ALIGN % TILE == 0
+
+# r, g, b (ints or arrays) as packed opaque RGBA words.
+def pack(r, g, b):
+    return np.uint32(ALPHA) | np.uint32(r) | np.uint32(g) << 8 | np.uint32(b) << 16
+
+class TiledFramebuffer:
+    def __init__(self, width=W, height=H, tile=TILE, buffer=None, init=True):
+        self.width, self.height, self.tile = width, height, tile
+        self.tiles_x = (width + tile - 1) // tile
+        self.tiles_y = (height + tile - 1) // tile
+
+        # one flat allocation so the tiles can live in shared memory
+        if buffer is None:
+            buffer = bytearray(self.nbytes(width, height, tile))
+        shape = (self.tiles_y, self.tiles_x, tile, tile)
+        self.tiles = np.ndarray(shape, dtype=np.uint32, buffer=buffer)
+        self.rgba = self.tiles.view(np.uint8).reshape(*shape, 4)
+
+        # init=False attaches to tiles another instance owns and resolves
+        self.output = None
+        if init:
+            self.tiles[:] = pack(0, 0, 0)
+            self.output = np.zeros((height, width, 3), dtype=np.uint8)
+
+    @staticmethod
+    def nbytes(width=W, height=H, tile=TILE):
+        tiles = ((width + tile - 1) // tile) * ((height + tile - 1) // tile)
+        return tiles * tile * tile * 4
+
+    def tile_range(self, x0, x1, y0, y1):
+        t = self.tile
+        return x0 // t, (x1 - 1) // t + 1, y0 // t, (y1 - 1) // t + 1
+
+    def clear(self, rect, color):
+        tx0, tx1, ty0, ty1 = self.tile_range(*rect)
+        self.tiles[ty0:ty1, tx0:tx1] = pack(*color)
+
+    # RGB view of a rect [x0, x1) x [y0, y1) that lies inside one tile.
+    def view(self, x0, x1, y0, y1):
+        t = self.tile
+        tx, ty = x0 // t, y0 // t
+        ox, oy = tx * t, ty * t
+        return self.rgba[ty, tx, y0 - oy:y1 - oy, x0 - ox:x1 - ox, :3]
+
+    # RGBA of every tile the rect overlaps, (tiles_y, tiles_x, TILE, TILE, 4).
+    def block(self, rect):
+        tx0, tx1, ty0, ty1 = self.tile_range(*rect)
+        return self.rgba[ty0:ty1, tx0:tx1]
+
+    # ================= RESOLVE =================
+    # Swizzle the tiles under rect into output and return all of output.
+    # The output rect is split along its own rows and columns into
+    # (tiles, TILE) axes, which is a view, and the tiles copied in one
+    # channel at a time: NumPy copies a 3-byte innermost axis element by
+    # element, several times slower than three strided byte planes. The
+    # frame's last partial row and column of tiles get their own, narrower
+    # split.
+    def resolve(self, rect=None):
+        x0, x1, y0, y1 = rect or (0, self.width, 0, self.height)
+        tx0, tx1, ty0, ty1 = self.tile_range(x0, x1, y0, y1)
+        t = self.tile
+        for ta, tb, rows in self.runs(ty0, ty1, self.height):
+            for sa, sb, cols in self.runs(tx0, tx1, self.width):
+                dst = self.output[ta * t:ta * t + (tb - ta) * rows,
+                                  sa * t:sa * t + (sb - sa) * cols]
+                dst = dst.reshape(tb - ta, rows, sb - sa, cols, 3)
+                src = self.rgba[ta:tb, sa:sb, :rows, :cols].swapaxes(1, 2)
+                for c in range(3):
+                    dst[..., c] = src[..., c]
+        return self.output
+
+    # Tiles [t0, t1) along one axis as runs (a, b, pixels per tile): the
+    # whole tiles, then the frame's partial last tile if it is in range.
+    def runs(self, t0, t1, size):
+        t = self.tile
+        last = size - (size - 1) // t * t
+        if last == t or t1 * t <= size:
+            return [(t0, t1, t)]
+        return [r for r in ((t0, t1 - 1, t), (t1 - 1, t1, last)) if r[0] < r[1]]
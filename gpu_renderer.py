@@ -2,60 +2,52 @@ import pygame
 import moderngl
 import numpy as np
 import time
-import math
-
-W, H = 800, 600
-
-# ================= SHAPES =================
-def get_shape(shape):
-    if shape == "triangle":
-        return np.array([
-            [-0.2, -0.2],
-            [ 0.2, -0.2],
-            [ 0.0,  0.2]
-        ], dtype="f4")
-
-    if shape == "square":
-        return np.array([
-            [-0.2, -0.2], [ 0.2, -0.2], [ 0.2,  0.2],
-            [-0.2, -0.2], [ 0.2,  0.2], [-0.2,  0.2]
-        ], dtype="f4")
-
-    if shape == "rectangle":
-        return np.array([
-            [-0.3, -0.15], [ 0.3, -0.15], [ 0.3,  0.15],
-            [-0.3, -0.15], [ 0.3,  0.15], [-0.3,  0.15]
-        ], dtype="f4")
+from collections import deque
+from contextlib import contextmanager
 
-# ================= GPU PIPELINE =================
-def run_gpu(shape_name):
-    pygame.init()
-    pygame.display.set_mode(
-        (W, H), pygame.OPENGL | pygame.DOUBLEBUF
-    )
+from pipeline import (
+    W, H, BG, BackendUnavailable, Instances, Renderer, apply_keys, initial_state, load_scene,
+    register_backend
+)
+from pacing import DEFAULT_PACING, format_pacing, parse_pacing
+from profiler import Profiler
 
-    ctx = moderngl.create_context()
-    ctx.viewport = (0, 0, W, H)
-
-    # ===== SHADERS =====
-    prog = ctx.program(
+# ================= GPU PIPELINE =================
+# ===== SHADERS =====
+# Vertices arrive in the same local pixel space as the CPU paths; the shader
+# applies the same rotation/translation and maps pixels (Y down) to NDC.
+# Every draw is instanced: the in_offset/in_angle/in_tint attributes advance
+# once per instance, and a scene without instances is one identity instance.
+def create_program(ctx):
+    return ctx.program(
         vertex_shader="""
         #version 330
         in vec2 in_vert;
         in vec3 in_color;
 
+        in vec2 in_offset;
+        in float in_angle;
+        in vec3 in_tint;
+
         uniform float angle;
         uniform vec2 offset;
+        uniform vec2 viewport;
 
         out vec3 v_color;
 
+        // column-major: rows are (c, -s) and (s, c), as on the CPU
+        mat2 rotation(float a) {
+            return mat2(cos(a), sin(a), -sin(a), cos(a));
+        }
+
         void main() {
-            mat2 r = mat2(
-                cos(angle), -sin(angle),
-                sin(angle),  cos(angle)
+            vec2 p = rotation(angle) * (rotation(in_angle) * in_vert + in_offset) + offset;
+            gl_Position = vec4(
+                p.x / viewport.x * 2.0 - 1.0,
+                1.0 - p.y / viewport.y * 2.0,
+                0.0, 1.0
             );
-            gl_Position = vec4(r * in_vert + offset, 0.0, 1.0);
-            v_color = in_color;
+            v_color = in_color * in_tint;
         }
         """,
         fragment_shader="""
@@ -69,73 +61,251 @@ def run_gpu(shape_name):
         """
     )
 
-    # ===== GEOMETRY =====
-    shape = get_shape(shape_name)
+# ===== GEOMETRY =====
+def create_vertex_buffer(ctx, scene):
+    # Interleave position + color
+    data = np.hstack([scene.verts, scene.colors / 255.0]).astype("f4")
+    return ctx.buffer(data.tobytes())
 
-    # CPU-equivalent vertex colors
-    VERTEX_COLORS = np.array([
-        [1.0, 0.0, 0.0],  # red
-        [0.0, 1.0, 0.0],  # green
-        [0.0, 0.0, 1.0],  # blue
-    ], dtype="f4")
+# Per-instance rows [x, y, angle, r, g, b]; without instances, one identity row.
+def instance_data(scene):
+    inst = scene.instances or Instances(np.zeros((1, 2)), np.zeros(1), np.ones((1, 3)))
+    return np.hstack([inst.pos, inst.angle[:, None], inst.color]).astype("f4")
 
-    colors = np.tile(VERTEX_COLORS, (len(shape) // 3, 1))
+def create_vao(ctx, prog, vbo, ibo):
+    return ctx.vertex_array(prog, [
+        (vbo, "2f 3f", "in_vert", "in_color"),
+        (ibo, "2f 1f 3f/i", "in_offset", "in_angle", "in_tint"),
+    ])
 
-    # Interleave position + color
-    vbo = ctx.buffer(np.hstack([shape, colors]).tobytes())
-    vao = ctx.simple_vertex_array(
-        prog, vbo,
-        "in_vert", "in_color"
+# A dynamic buffer rewritten every frame. Writes go round a ring of buffers
+# and each is orphaned before it is refilled, so the driver hands back fresh
+# storage instead of making the CPU wait until the GPU is done reading the
+# data of an earlier frame. write() takes an array and returns the ring slot
+# it filled.
+class StreamBuffer:
+    def __init__(self, ctx, nbytes, ring=3):
+        self.buffers = [ctx.buffer(reserve=nbytes, dynamic=True) for _ in range(ring)]
+        self.slot = 0
+
+    def write(self, data):
+        self.slot = (self.slot + 1) % len(self.buffers)
+        buf = self.buffers[self.slot]
+        buf.orphan(data.nbytes)
+        buf.write(data)
+        return self.slot
+
+# ===== GPU TIMING =====
+# GPU-side time of the draw calls, from timer queries. A query's result is
+# only ready once the GPU has caught up, so queries are recycled round a
+# ring and read back ring frames after they were issued, by which time they
+# are long finished; collect() reads whatever is still in flight.
+#
+# Software GL (llvmpipe) only times command submission, not its deferred
+# rasterization, so there the GPU time is close to zero.
+NO_RESULT = 2 ** 32 - 1   # what some drivers return for a query with no result
+
+class GPUTimer:
+    def __init__(self, ctx, ring=4):
+        self.free = [ctx.query(time=True) for _ in range(ring)]
+        self.pending = deque()
+        self.gpu_ms = []
+
+    @contextmanager
+    def measure(self):
+        if not self.free:
+            self.collect(1)
+        query = self.free.pop()
+        with query:
+            yield
+        self.pending.append(query)
+
+    def collect(self, count=None):
+        for _ in range(len(self.pending) if count is None else count):
+            query = self.pending.popleft()
+            if query.elapsed != NO_RESULT:
+                self.gpu_ms.append(query.elapsed / 1e6)
+            self.free.append(query)
+
+def create_offscreen_context():
+    # X11/WGL first, then headless EGL (e.g. Mesa llvmpipe on CI boxes)
+    try:
+        return moderngl.create_standalone_context()
+    except Exception:
+        pass
+    try:
+        return moderngl.create_standalone_context(backend="egl")
+    except Exception as e:
+        raise BackendUnavailable(f"no OpenGL context: {e}") from e
+
+# ================= RENDERER =================
+# Without a ctx the renderer owns a standalone context and reads every frame
+# back into a (height, width, 3) array; with the window's ctx, draw() renders
+# straight to the screen.
+#
+# draw() only submits work; nothing waits for the GPU except the readback in
+# render() and the buffer swap of the window loop. latency=True finishes
+# every frame inside draw() instead, so its time covers the whole frame.
+# stream=True re-uploads the per-instance buffer every frame through a
+# StreamBuffer, so scene.instances may change between frames.
+#
+# With samples > 1 the frame is drawn into a multisample framebuffer and
+# resolved into the output with a blit. The shader maps the W x H reference
+# space to NDC, so any output size shows the same picture.
+@register_backend("gpu")
+class GPURenderer(Renderer):
+    def __init__(self, scene, ctx=None, latency=False, stream=False, **options):
+        super().__init__(scene, **options)
+        self.offscreen = ctx is None
+        self.latency = latency
+        self.stream = stream
+        self.ctx = create_offscreen_context() if self.offscreen else ctx
+
+        size = (self.width, self.height)
+        self.output = self.ctx.simple_framebuffer(size) if self.offscreen else self.ctx.screen
+        self.fbo = self.output
+        if self.samples > 1:
+            self.fbo = self.ctx.framebuffer(
+                color_attachments=[self.ctx.renderbuffer(size, samples=self.samples)],
+                depth_attachment=self.ctx.depth_renderbuffer(size, samples=self.samples)
+            )
+
+        self.prog = create_program(self.ctx)
+        self.prog["viewport"].value = (W, H)
+        vbo = create_vertex_buffer(self.ctx, scene)
+        per_instance = instance_data(scene)
+        self.instances = len(per_instance)
+        if stream:
+            self.instance_buffer = StreamBuffer(self.ctx, per_instance.nbytes)
+            self.vaos = [create_vao(self.ctx, self.prog, vbo, ibo)
+                         for ibo in self.instance_buffer.buffers]
+            # the geometry can change while the frame state does not
+            self.tracker.enabled = False
+        else:
+            self.vaos = [create_vao(self.ctx, self.prog, vbo, self.ctx.buffer(per_instance.tobytes()))]
+
+        # same "z < stored" test as the software depth buffer, and the same
+        # front faces as their cull stage: clockwise on screen, which the
+        # Y flip to NDC keeps clockwise in GL window space
+        self.ctx.enable(moderngl.DEPTH_TEST)
+        if self.cull_backfaces:
+            self.ctx.front_face = "cw"
+            self.ctx.enable(moderngl.CULL_FACE)
+        self.frame = None
+
+        self.timer = GPUTimer(self.ctx)
+        self.submit_ms = []
+
+    # Returns False, drawing nothing, if the last frame is still valid. The
+    # vertices are only transformed on the GPU, so any change redraws it all.
+    def draw(self, state):
+        profiler = self.profiler
+        if self.tracker.unchanged(state):
+            self.damage = None
+            return False
+        self.damage = self.tracker.update(state)
+
+        t0 = time.perf_counter()
+        with profiler.stage("setup"):
+            self.fbo.use()
+            self.prog["angle"].value = state.angle
+            self.prog["offset"].value = tuple(state.pos)
+            vao = self.vaos[0]
+            if self.stream:
+                # the count follows the data: instances may come and go
+                data = instance_data(self.scene)
+                self.instances = len(data)
+                vao = self.vaos[self.instance_buffer.write(data)]
+
+        with profiler.stage("raster"):
+            with self.timer.measure():
+                self.fbo.clear(*(c / 255.0 for c in BG))
+                vao.render(instances=self.instances)
+                if self.fbo is not self.output:
+                    self.ctx.copy_framebuffer(self.output, self.fbo)
+            self.submit_ms.append((time.perf_counter() - t0) * 1000)
+            if self.latency:
+                self.ctx.finish()
+        return True
+
+    def render(self, state):
+        if not self.draw(state):
+            return self.frame
+        with self.profiler.stage("output"):
+            frame = np.frombuffer(self.output.read(components=3), dtype=np.uint8)
+            self.frame = np.flipud(frame.reshape(self.height, self.width, 3))
+            return self.frame
+
+    # Mean GPU time per drawn frame next to the CPU time spent submitting it.
+    def stats(self):
+        self.timer.collect()
+        gpu_ms = self.timer.gpu_ms
+        if not self.submit_ms or not gpu_ms:
+            return None
+        return {
+            "gpu_ms": sum(gpu_ms) / len(gpu_ms),
+            "submit_ms": sum(self.submit_ms) / len(self.submit_ms),
+        }
+
+    def close(self):
+        if self.offscreen:
+            self.ctx.release()
+
+# ================= MAIN GPU LOOP =================
+# Paced and reported like run_interactive; present is the buffer flip.
+def run_gpu(shape_name, profiler=None, pacing=DEFAULT_PACING):
+    pygame.init()
+    pygame.display.set_mode(
+        (W, H), pygame.OPENGL | pygame.DOUBLEBUF
     )
 
-    pos = np.array([0.0, 0.0], dtype="f4")
-    angle = 0.0
+    ctx = moderngl.create_context()
+    ctx.viewport = (0, 0, W, H)
 
-    MOVE = 0.02
-    ROT = 0.08
+    renderer = GPURenderer(load_scene(shape_name), ctx=ctx)
+    renderer.profiler = profiler = profiler or Profiler()
+    state = initial_state()
 
-    clock = pygame.time.Clock()
-    frame_times = []
+    pacer = parse_pacing(pacing)
 
     running = True
     while running:
-        t0 = time.perf_counter()
+        ticks = pacer.begin_frame()
 
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                running = False
-            if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_ESCAPE:
+        with profiler.stage("events"):
+            for e in pygame.event.get():
+                if e.type == pygame.QUIT:
                     running = False
+                if e.type == pygame.KEYDOWN:
+                    if e.key == pygame.K_ESCAPE:
+                        running = False
 
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  pos[0] -= MOVE
-        if keys[pygame.K_RIGHT]: pos[0] += MOVE
-        if keys[pygame.K_UP]:    pos[1] += MOVE
-        if keys[pygame.K_DOWN]:  pos[1] -= MOVE
-        if keys[pygame.K_r]:     angle += ROT
-
-        prog["angle"].value = angle
-        prog["offset"].value = tuple(pos)
-
-        ctx.clear(0.1, 0.1, 0.1)
-        vao.render()
-        ctx.finish()
+            keys = pygame.key.get_pressed()
+            for _ in range(ticks):
+                apply_keys(state, keys, pygame)
 
-        fps = clock.get_fps()
-        pygame.display.set_caption(f"GPU MODE | FPS: {fps:.1f}")
+        drawn = renderer.draw(state)
 
-        pygame.display.flip()
-        clock.tick(60)
+        pygame.display.set_caption(f"GPU MODE | FPS: {pacer.fps():.1f}")
 
-        frame_times.append(time.perf_counter() - t0)
+        # an unchanged frame is still on screen
+        with profiler.stage("present"):
+            if drawn:
+                pygame.display.flip()
+        with profiler.stage("wait"):
+            pacer.wait()
+        profiler.end_frame()
 
+    gpu_stats = renderer.stats()
     pygame.quit()
 
-    avg_ms = sum(frame_times) / len(frame_times) * 1000
-    avg_fps = 1000 / avg_ms
+    report = pacer.report()
+    print(f"GPU MODE: {format_pacing(report)}")
 
     return {
-        "avg_ms": avg_ms,
-        "avg_fps": avg_fps
+        "avg_ms": report["busy_ms"],
+        "avg_fps": report["fps"],
+        "pacing": report,
+        "gpu": gpu_stats,
+        "stages": profiler.summary()
     }
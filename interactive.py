@@ -0,0 +1,112 @@
+import pygame
+
+from pacing import DEFAULT_PACING, format_pacing, parse_pacing
+from pipeline import WHITE, apply_keys, initial_state
+from profiler import Profiler
+
+# ================= INTERACTIVE LOOP =================
+# Shared window loop for the software backends: the renderer draws into its
+# framebuffer, which is blitted under a small HUD with a "switch" button.
+#
+#   lines(renderer, state) -> extra HUD lines under the title
+#   button = (label, colour, action) returned when clicked
+#   on_key(key, renderer, state) for backend-specific toggles
+#
+# Every frame is profiled by stage; the summary is returned under "stages".
+# Frames are paced by a FramePacer built from the pacing spec (see
+# pacing.py): input is sampled first thing in every frame, and the pacer's
+# report is returned under "pacing", with avg_ms its mean busy time and
+# avg_fps the frame rate actually presented.
+#
+# Only what changed is presented: the renderer's damage rect (nothing if it
+# reused its last frame), the HUD strip and the button, passed as a rect list
+# to pygame.display.update.
+def run_interactive(renderer, caption, title, lines=None, button=None, on_key=None,
+                    profiler=None, pacing=DEFAULT_PACING):
+    pygame.init()
+    size = width, height = renderer.width, renderer.height
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(caption)
+
+    pacer = parse_pacing(pacing)
+    font = pygame.font.SysFont("consolas", 18)
+
+    state = initial_state()
+    renderer.profiler = profiler = profiler or Profiler()
+
+    button_rect = pygame.Rect(width - 210, height - 60, 190, 40)
+
+    running = True
+    action = "exit"
+
+    # the renderer may hold OS resources (shared memory, worker processes,
+    # a GL context): release them even if a frame or key handler raises
+    try:
+        while running:
+            ticks = pacer.begin_frame()
+
+            with profiler.stage("events"):
+                for e in pygame.event.get():
+                    if e.type == pygame.QUIT:
+                        running = False
+                    if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
+                        running = False
+                    if e.type == pygame.MOUSEBUTTONDOWN and button:
+                        if button_rect.collidepoint(e.pos):
+                            action = button[2]
+                            running = False
+                    if e.type == pygame.KEYDOWN and on_key:
+                        on_key(e.key, renderer, state)
+
+                keys = pygame.key.get_pressed()
+                for _ in range(ticks):
+                    apply_keys(state, keys, pygame)
+
+            frame = renderer.render(state)
+
+            with profiler.stage("blit"):
+                surface = pygame.image.frombuffer(frame, size, "RGB")
+                dirty = []
+                if renderer.damage:
+                    x0, x1, y0, y1 = renderer.damage
+                    rect = pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+                    screen.blit(surface, rect, area=rect)
+                    dirty.append(rect)
+
+                # ===== UI =====
+                # the HUD text changes every frame: restore the frame under it first
+                busy_ms = pacer.busy[-1] * 1000 if pacer.busy else 0.0
+                hud = [f"{title} | FPS: {pacer.fps():.1f} | busy {busy_ms:.1f} ms"]
+                hud += lines(renderer, state) if lines else []
+                hud_rect = pygame.Rect(0, 0, width, 15 + 20 * len(hud))
+                screen.blit(surface, hud_rect, area=hud_rect)
+                for i, line in enumerate(hud):
+                    screen.blit(font.render(line, True, WHITE), (10, 10 + 20 * i))
+                dirty.append(hud_rect)
+
+                if button:
+                    label, color, _ = button
+                    pygame.draw.rect(screen, color, button_rect)
+                    screen.blit(font.render(label, True, WHITE),
+                                (button_rect.x + 10, button_rect.y + 10))
+                    dirty.append(button_rect)
+
+            with profiler.stage("present"):
+                pygame.display.update(dirty)
+            with profiler.stage("wait"):
+                pacer.wait()
+            profiler.end_frame()
+    finally:
+        renderer.close()
+        pygame.quit()
+
+    report = pacer.report()
+    print(f"{title}: {format_pacing(report)}")
+
+    return {
+        "action": action,
+        "avg_ms": report["busy_ms"],
+        "avg_fps": report["fps"],
+        "pacing": report,
+        "stages": profiler.summary()
+    }
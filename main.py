@@ -25,33 +25,41 @@
 # print(f"Speedup: {cpu_result['avg_ms'] / gpu_result['avg_ms']:.2f}x")
 
 if __name__ == "__main__":
+    import argparse
+
     from menu import choose_shape
+    from pacing import DEFAULT_PACING, format_pacing
     from cpu_renderer import run_cpu
     from cpu_renderer_multicore import run_cpu_multicore
     from gpu_renderer import run_gpu
     from cpu_renderer_vectorized import run_cpu_vectorized
 
+    parser = argparse.ArgumentParser(description="Interactive CPU vs GPU comparison")
+    parser.add_argument("--pacing", default=DEFAULT_PACING,
+                        help="capped:<hz>, uncapped[:<hz>] or fixed:<hz> (fixed-timestep simulation)")
+    args = parser.parse_args()
+
     shape = choose_shape()
     if not shape:
         exit()
 
     # 1️⃣ Single-core CPU
-    cpu_single = run_cpu(shape)
+    cpu_single = run_cpu(shape, pacing=args.pacing)
 
     if cpu_single["action"] != "multicore":
         exit()
 
     # 2️⃣ Multi-core CPU
-    cpu_multi = run_cpu_multicore(shape)
+    cpu_multi = run_cpu_multicore(shape, pacing=args.pacing)
 
     if cpu_multi["action"] != "vec":
         exit()
     
-    cpu_vec = run_cpu_vectorized(shape)
+    cpu_vec = run_cpu_vectorized(shape, pacing=args.pacing)
     if cpu_vec["action"] != "gpu":
         exit()
 
-    gpu_result = run_gpu(shape)
+    gpu_result = run_gpu(shape, pacing=args.pacing)
 
     # 4️⃣ Final scoreboard
     print("\n===== FINAL PERFORMANCE COMPARISON =====")
@@ -77,3 +85,15 @@ if __name__ == "__main__":
     print(f"  Speedup vs Single-Core: {cpu_single['avg_ms'] / gpu_result['avg_ms']:.2f}x")
     print(f"  Speedup vs Multi-Core : {cpu_multi['avg_ms'] / gpu_result['avg_ms']:.2f}x")
     print(f"  Speedup vs Vectorized : {cpu_vec['avg_ms'] / gpu_result['avg_ms']:.2f}x")
+
+    print("\nPer-stage mean ms")
+    runs = [("Single-Core", cpu_single), ("Multi-Core", cpu_multi),
+            ("Vectorized", cpu_vec), ("GPU", gpu_result)]
+    for label, result in runs:
+        stages = "  ".join(f"{k} {v['mean_ms']:.2f}" for k, v in result["stages"].items())
+        print(f"  {label:<12}{stages}")
+
+    # avg_ms above is busy time; what is left of each refresh under load
+    print("\nPacing")
+    for label, result in runs:
+        print(f"  {label:<12}{format_pacing(result['pacing'])}")
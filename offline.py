@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+# pygame prints a support banner to stdout when imported, and stdout may be
+# carrying raw frames; this must run before anything imports pygame
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+from benchmark import BACKEND_NAMES, make_script
+from pipeline import (
+    W, H, FrameState, create_renderer, initial_state, load_scene, parse_resolution
+)
+
+# Offline renderer: renders a deterministic frame sequence with any backend,
+# as fast as it goes, and streams the frames out, e.g.
+#   python offline.py --shape square --keyframes anim.json --format png --out frames
+#   python offline.py --script orbit --frames 240 --format raw \
+#       --pipe "ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 60 -i - orbit.mp4"
+#
+# Rendering and writing overlap: the main thread renders into a bounded
+# queue and writer threads drain it, so a slow encoder or disk stalls the
+# renderer only once the queue is full, and memory stays bounded either way.
+
+FORMATS = ["png", "npy", "raw"]
+
+# ================= ANIMATION =================
+# A keyframe file is a JSON list of {"frame": n, "pos": [x, y], "angle": a},
+# with pos in the W x H reference space whatever the output resolution,
+# and optionally "render_mode". Position and angle are interpolated
+# linearly between keyframes, render_mode holds until the next keyframe, and
+# frames outside the keyframes hold the nearest one.
+def load_keyframes(path):
+    with open(path) as f:
+        keys = sorted(json.load(f), key=lambda k: k["frame"])
+    if not keys:
+        raise ValueError(f"no keyframes in {path}")
+    return keys
+
+def keyframe_states(keys, frames):
+    at = [k["frame"] for k in keys]
+    xs = [k["pos"][0] for k in keys]
+    ys = [k["pos"][1] for k in keys]
+    angles = [k.get("angle", 0.0) for k in keys]
+
+    for i in range(frames):
+        key = keys[max(np.searchsorted(at, i, side="right") - 1, 0)]
+        yield FrameState(
+            pos=np.array([np.interp(i, at, xs), np.interp(i, at, ys)]),
+            angle=float(np.interp(i, at, angles)),
+            render_mode=key.get("render_mode", 0)
+        )
+
+# The benchmark scripts as states: the same frames benchmark.py measures.
+def script_states(name, frames):
+    state = initial_state()
+    for dx, dy, dangle in make_script(name, frames):
+        state.pos[0] += dx
+        state.pos[1] += dy
+        state.angle += dangle
+        yield FrameState(state.pos.copy(), state.angle)
+
+# ================= SINKS =================
+# write(index, frame) is called from writer threads with a (height, width, 3)
+# array the sink may keep. Ordered sinks get a single writer, in frame order.
+class FileSink:
+    ordered = False
+
+    def __init__(self, out, fmt):
+        os.makedirs(out, exist_ok=True)
+        self.fmt = fmt
+        self.pattern = os.path.join(out, "frame_{:05d}." + fmt)
+
+    def write(self, index, frame):
+        path = self.pattern.format(index)
+        if self.fmt == "npy":
+            np.save(path, frame)
+        else:
+            height, width = frame.shape[:2]
+            pygame.image.save(pygame.image.frombuffer(frame, (width, height), "RGB"), path)
+
+    def close(self):
+        pass
+
+# Raw rgb24 frames, back to back, into a command's stdin or to stdout.
+class PipeSink:
+    ordered = True
+
+    def __init__(self, command=None):
+        self.proc = None
+        if command:
+            self.proc = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+            self.stream = self.proc.stdin
+        else:
+            self.stream = sys.stdout.buffer
+
+    def write(self, index, frame):
+        self.stream.write(frame.data)
+
+    def close(self):
+        self.stream.flush()
+        if self.proc:
+            self.proc.stdin.close()
+            if self.proc.wait() != 0:
+                raise RuntimeError(f"encoder exited with status {self.proc.returncode}")
+
+def create_sink(fmt, out=None, pipe=None):
+    if fmt == "raw":
+        return PipeSink(pipe)
+    if not out:
+        raise ValueError(f"--out is required for {fmt} frames")
+    return FileSink(out, fmt)
+
+# ================= PIPELINE =================
+# Renders every state and hands the frames to the sink through a queue of
+# at most queue_size frames. Returns timings: render is time spent in the
+# renderer, stall is time the renderer waited on a full queue, and
+# writer_busy is each writer thread's time inside sink.write.
+def render_sequence(renderer, states, sink, queue_size=8, writers=2):
+    writers = 1 if sink.ordered else writers
+    frames = queue.Queue(maxsize=queue_size)
+    errors = []
+    busy = [0.0] * writers
+
+    def consume(k):
+        while True:
+            item = frames.get()
+            if item is None:
+                return
+            # after a failure keep draining so the renderer never blocks
+            if errors:
+                continue
+            t0 = time.perf_counter()
+            try:
+                sink.write(*item)
+            except Exception as e:
+                errors.append(e)
+            busy[k] += time.perf_counter() - t0
+
+    threads = [threading.Thread(target=consume, args=(k,), daemon=True) for k in range(writers)]
+    for t in threads:
+        t.start()
+
+    count = 0
+    checksum = 0
+    render_s = stall_s = 0.0
+    t_start = time.perf_counter()
+    try:
+        for i, state in enumerate(states):
+            if errors:
+                break
+
+            t0 = time.perf_counter()
+            # the renderer reuses its framebuffer, so the queue gets a copy
+            frame = np.array(renderer.render(state))
+            t1 = time.perf_counter()
+            checksum = zlib.crc32(frame.data, checksum)
+            frames.put((i, frame))
+
+            render_s += t1 - t0
+            stall_s += time.perf_counter() - t1
+            count += 1
+    finally:
+        for _ in threads:
+            frames.put(None)
+        for t in threads:
+            t.join()
+        sink.close()
+
+    if errors:
+        raise errors[0]
+
+    total = time.perf_counter() - t_start
+    return {
+        "frames": count,
+        "total_s": total,
+        "render_s": render_s,
+        "stall_s": stall_s,
+        "writer_busy_s": busy,
+        "fps": count / total if total > 0 else 0.0,
+        "checksum": f"{checksum:08x}",
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline frame-sequence renderer")
+    parser.add_argument("--backend", default="vectorized", choices=BACKEND_NAMES)
+    parser.add_argument("--shape", default="square",
+                        help="triangle, square, rectangle or a scene spec such as soup:5000,overdraw=4")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--script", default="orbit", choices=["static", "spin", "orbit", "keys"])
+    parser.add_argument("--keyframes", help="JSON keyframe file, instead of --script")
+    parser.add_argument("--format", default="png", choices=FORMATS)
+    parser.add_argument("--out", help="directory for png/npy frames")
+    parser.add_argument("--pipe", help="encoder command to pipe raw frames into (default stdout)")
+    parser.add_argument("--queue", type=int, default=8, help="frames in flight between threads")
+    parser.add_argument("--writers", type=int, default=2, help="writer threads for png/npy")
+    parser.add_argument("--resolution", default=f"{W}x{H}", help="output size, e.g. 1920x1080")
+    parser.add_argument("--samples", type=int, default=1, help="samples per pixel: 1, 2 or 4")
+    parser.add_argument("--fixed-point", action="store_true",
+                        help="rasterize in 28.4 fixed point with the top-left rule (CPU backends)")
+    parser.add_argument("--json", help="write the timings to this file")
+    args = parser.parse_args(argv)
+    width, height = parse_resolution(args.resolution)
+
+    if args.keyframes:
+        states = keyframe_states(load_keyframes(args.keyframes), args.frames)
+    else:
+        states = script_states(args.script, args.frames)
+
+    sink = create_sink(args.format, args.out, args.pipe)
+    with create_renderer(args.backend, load_scene(args.shape),
+                         width=width, height=height, samples=args.samples,
+                         fixed_point=args.fixed_point) as renderer:
+        result = render_sequence(renderer, states, sink, args.queue, args.writers)
+
+    # stdout may be carrying the frames
+    busy = ", ".join(f"{b:.2f}" for b in result["writer_busy_s"])
+    print(f"{result['frames']} frames in {result['total_s']:.2f} s ({result['fps']:.1f} fps): "
+          f"render {result['render_s']:.2f} s, stalled {result['stall_s']:.2f} s, "
+          f"writers busy [{busy}] s, checksum {result['checksum']}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "shape": args.shape, **result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
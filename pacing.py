@@ -0,0 +1,143 @@
+import math
+import time
+
+import numpy as np
+
+# ================= FRAME PACING =================
+# One pacer drives every interactive loop (and benchmark.py --pacing), so
+# frame time, idle time, dropped frames and latency are measured the same
+# way for every backend. A pacing spec is "<mode>[:<hz>]":
+#
+#   capped:60    vsync-like: a frame is shown on a 1/hz refresh boundary,
+#                sleeping until it; a frame that misses its boundary waits
+#                for the next one, and every boundary skipped is dropped
+#   uncapped:60  never sleeps; hz is only the refresh rate frames are judged
+#                against, a frame busy for longer than 1/hz dropping the
+#                refreshes it spans
+#   fixed:60     paced like capped, but the simulation advances in fixed
+#                1/hz ticks: a late frame runs every tick it missed (at
+#                most MAX_STEPS, the rest is lag) before drawing once, so
+#                motion keeps real-time speed under load
+#
+# Every frame a loop calls begin_frame() and samples its input straight
+# after it, applies the returned number of ticks, draws and presents, then
+# calls wait(). Busy time runs from begin_frame() to wait(), idle time is
+# the sleep in wait(). Latency is input-to-present for an input that
+# arrives just after the previous frame sampled, the worst case: it waits
+# a whole frame interval to be seen, then this frame's busy time.
+
+PACING_MODES = ["capped", "uncapped", "fixed"]
+DEFAULT_PACING = "capped:60"
+
+# fixed-timestep ticks run in one frame before the rest is dropped as lag
+MAX_STEPS = 5
+
+class FramePacer:
+    def __init__(self, mode="capped", hz=60):
+        if mode not in PACING_MODES:
+            raise ValueError(f"unknown pacing mode: {mode}")
+        self.mode = mode
+        self.hz = hz
+        self.period = 1.0 / hz
+
+        self.busy = []
+        self.idle = []
+        self.latency = []
+        self.intervals = []
+        self.dropped = 0
+        self.ticks = 0
+        self.lag = 0
+
+        self.start = self.end = None
+        self.deadline = None
+        self.missed = 0
+        self.t0 = self.t_input = None
+
+    # Starts a frame and stamps its input sample; returns the number of
+    # simulation ticks to apply (1 unless fixed-timestep).
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+            self.deadline = now + self.period
+        else:
+            self.intervals.append(now - self.t0)
+
+        self.t_input, self.t0 = self.t0 or now, now
+
+        ticks = 1
+        if self.mode == "fixed":
+            due = 1 + self.missed
+            ticks = min(due, MAX_STEPS)
+            self.lag += due - ticks
+        self.ticks += ticks
+        return ticks
+
+    # Call right after presenting: ends the frame's busy time and sleeps
+    # until the next refresh boundary, unless uncapped.
+    def wait(self):
+        now = time.perf_counter()
+        busy = now - self.t0
+        self.busy.append(busy)
+        self.latency.append(now - self.t_input)
+
+        if self.mode == "uncapped":
+            self.missed = max(math.ceil(busy / self.period) - 1, 0)
+            idle = 0.0
+        else:
+            self.missed = 0
+            if now > self.deadline:
+                self.missed = math.ceil((now - self.deadline) / self.period)
+                self.deadline += self.missed * self.period
+            idle = self.deadline - now
+            time.sleep(idle)
+            self.deadline += self.period
+
+        self.dropped += self.missed
+        self.idle.append(idle)
+        self.end = time.perf_counter()
+
+    # Frames per second over the last n frames, for a HUD.
+    def fps(self, n=30):
+        recent = self.intervals[-n:]
+        return len(recent) / sum(recent) if recent else 0.0
+
+    def report(self):
+        busy = np.array(self.busy) * 1000
+        latency = np.array(self.latency) * 1000
+        wall = self.end - self.start
+        period_ms = self.period * 1000
+        out = {
+            "mode": self.mode,
+            "hz": self.hz,
+            "frames": len(busy),
+            "fps": len(busy) / wall,
+            "busy_ms": float(busy.mean()),
+            "busy_p95_ms": float(np.percentile(busy, 95)),
+            "idle_ms": float(np.mean(self.idle) * 1000),
+            "utilization": float(busy.sum() / (wall * 1000)),
+            # time left in a refresh at the 95th-percentile frame
+            "headroom_ms": period_ms - float(np.percentile(busy, 95)),
+            "dropped": self.dropped,
+            "latency_ms": float(latency.mean()),
+            "latency_p95_ms": float(np.percentile(latency, 95)),
+        }
+        if self.mode == "fixed":
+            out["ticks"] = self.ticks
+            out["lag_ticks"] = self.lag
+        return out
+
+def parse_pacing(spec):
+    mode, _, hz = spec.partition(":")
+    return FramePacer(mode, float(hz) if hz else 60)
+
+# One line per run, e.g. for main.py's scoreboard and benchmark.py.
+def format_pacing(report):
+    line = (f"{report['mode']} {report['hz']:g} Hz: {report['fps']:.1f} fps, "
+            f"busy {report['busy_ms']:.2f} ms (p95 {report['busy_p95_ms']:.2f}), "
+            f"idle {report['idle_ms']:.2f} ms, headroom {report['headroom_ms']:.2f} ms, "
+            f"dropped {report['dropped']}, "
+            f"latency {report['latency_ms']:.2f} ms (p95 {report['latency_p95_ms']:.2f})")
+    if "ticks" in report:
+        line += f", ticks {report['ticks']} (lag {report['lag_ticks']})"
+    return line
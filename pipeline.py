@@ -0,0 +1,617 @@
+import importlib
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+from profiler import NULL_PROFILER
+
+# Shared pipeline core: scene description, vertex transform, viewport
+# mapping and the Renderer interface every backend implements, so all
+# backends draw exactly the same workload.
+#
+# Scenes live in a W x H reference space; renderers map it onto their own
+# width x height, so the picture is the same at every resolution.
+
+W, H = 800, 600
+WHITE = (255, 255, 255)
+BG = (30, 30, 30)
+
+VERTEX_COLORS = np.array([
+    [255, 0, 0],   # Red
+    [0, 255, 0],   # Green
+    [0, 0, 255]    # Blue
+], dtype=float)
+
+MOVE = 4
+ROT = 0.08
+
+# ================= SHAPES =================
+# Local pixel space, centred on the origin, Y down.
+def get_shape(shape):
+    from scenes import is_scene_spec, parse_scene
+
+    if is_scene_spec(shape):
+        return parse_scene(shape)
+
+    if shape == "triangle":
+        return np.array([
+            [-50, -50],
+            [ 50, -50],
+            [  0,  50]
+        ], dtype=float)
+
+    if shape == "square":
+        return np.array([
+            [-50, -50], [ 50, -50], [ 50,  50],
+            [-50, -50], [ 50,  50], [-50,  50]
+        ], dtype=float)
+
+    if shape == "rectangle":
+        return np.array([
+            [-70, -40], [ 70, -40], [ 70,  40],
+            [-70, -40], [ 70,  40], [-70,  40]
+        ], dtype=float)
+
+    raise ValueError(f"unknown shape: {shape}")
+
+# ================= SCENE =================
+# Per-instance transforms as struct-of-arrays buffers, one row per instance.
+@dataclass
+class Instances:
+    pos: np.ndarray      # (M, 2) offset in local pixel space
+    angle: np.ndarray    # (M,) rotation, radians
+    color: np.ndarray    # (M, 3) tint, 0..1, multiplied into the vertex colours
+
+# Without instances, verts/colors are the whole scene. With instances they
+# are one base mesh, drawn once per instance: instance i is the mesh rotated
+# by angle[i], moved to pos[i] and tinted by color[i], in instance order.
+@dataclass
+class Scene:
+    verts: np.ndarray    # (N * 3, 2) local pixel space
+    colors: np.ndarray   # (N * 3, 3) per-vertex colour, 0..255
+    w: np.ndarray = None  # (N * 3,) clip-space w from a projection, None if orthographic
+    instances: Instances = None
+
+    # Per-vertex colours of everything drawn, matching Renderer.to_screen's rows.
+    @cached_property
+    def vertex_colors(self):
+        if self.instances is None:
+            return self.colors
+        return (self.instances.color[:, None, :] * self.colors[None]).reshape(-1, 3)
+
+def load_scene(shape_name):
+    from scenes import is_instance_spec, parse_instances
+
+    instances = None
+    if is_instance_spec(shape_name):
+        verts, instances = parse_instances(shape_name)
+    else:
+        verts = get_shape(shape_name)
+    colors = np.tile(VERTEX_COLORS, (len(verts) // 3, 1))
+    return Scene(verts, colors, instances=instances)
+
+# ================= FRAME STATE =================
+@dataclass
+class FrameState:
+    pos: np.ndarray
+    angle: float = 0.0
+    render_mode: int = 0   # 0 filled, 1 wireframe, 2 overdraw (backends that support it)
+
+def initial_state():
+    return FrameState(pos=np.array([W // 2, H // 2], dtype=float))
+
+# Arrow keys move, R rotates; the same bindings and step sizes everywhere.
+def apply_keys(state, keys, pygame):
+    if keys[pygame.K_LEFT]:  state.pos[0] -= MOVE
+    if keys[pygame.K_RIGHT]: state.pos[0] += MOVE
+    if keys[pygame.K_UP]:    state.pos[1] -= MOVE
+    if keys[pygame.K_DOWN]:  state.pos[1] += MOVE
+    if keys[pygame.K_r]:     state.angle += ROT
+
+# ================= TRANSFORM =================
+def edge(a, b, c):
+    return (c[0] - a[0]) * (b[1] - a[1]) - (c[1] - a[1]) * (b[0] - a[0])
+
+def rotation(angle):
+    c, s = math.cos(angle), math.sin(angle)
+    return np.array([[c, -s], [s, c]])
+
+# The scene is transformed in two steps, so that Renderer.to_screen can cache
+# the first (see GEOMETRY CACHE). rotate_scene is the part that depends on
+# the angle only: the vertices rotated about the origin, (V, 2), or per
+# instance (M, V, 2), and the instances' rotated positions (M, 2), None
+# without instances. Instances are rotated together in one batched matmul:
+# each instance's rotation is its own angle plus the frame's, and its
+# position is rotated by the frame.
+def rotate_scene(scene, angle):
+    inst = scene.instances
+    if inst is None:
+        return scene.verts @ rotation(angle).T, None
+
+    angles = inst.angle + angle
+    c, s = np.cos(angles), np.sin(angles)
+    rot_t = np.stack([np.stack([c, s], axis=-1), np.stack([-s, c], axis=-1)], axis=-2)
+    return scene.verts @ rot_t, inst.pos @ rotation(angle).T
+
+# rotate_scene's output moved to pos, as screen-space (N * 3, 3) [x, y, z]
+# rows.
+def place(rotated, offsets, pos):
+    if offsets is None:
+        out = np.zeros((len(rotated), 3))
+        out[:, :2] = rotated + pos
+        return out
+
+    out = np.zeros((offsets.shape[0] * rotated.shape[1], 3))
+    out[:, :2] = (rotated + (offsets + pos)[:, None]).reshape(-1, 2)
+    return out
+
+# Reference space to a width x height target, in place. offset moves the
+# geometry by minus a sub-pixel sample offset, so that sample position lands
+# on the pixel's sample point.
+def viewport(points, width=W, height=H, offset=(0.0, 0.0)):
+    points[:, 0] = points[:, 0] * (width / W) - offset[0]
+    points[:, 1] = points[:, 1] * (height / H) - offset[1]
+    return points
+
+# "1920x1080" to (1920, 1080).
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+# ================= DAMAGE TRACKING =================
+# Screen rects are pixel ranges (x0, x1, y0, y1), end-exclusive.
+FULL_FRAME = (0, W, 0, H)
+
+# Dirty rects are grown to multiples of this, so they cover whole tiles of
+# every tiled backend.
+DIRTY_ALIGN = 64
+
+# Bounds of screen-space points, clipped to the screen, or None if off-screen.
+# One pixel of margin on each side covers sub-pixel sample offsets.
+def screen_rect(points, width=W, height=H):
+    x0 = max(int(np.floor(points[:, 0].min())) - 1, 0)
+    x1 = min(int(np.floor(points[:, 0].max())) + 2, width)
+    y0 = max(int(np.floor(points[:, 1].min())) - 1, 0)
+    y1 = min(int(np.floor(points[:, 1].max())) + 2, height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, x1, y0, y1
+
+# Frame-to-frame change tracking for incremental rendering. If the frame
+# state is the same as last frame, the last frame is still valid. Otherwise
+# only the union of the scene's old and new bounds needs clearing and
+# redrawing; everything outside both is background in either frame.
+class DamageTracker:
+    def __init__(self, width=W, height=H, enabled=True):
+        self.width, self.height = width, height
+        self.full = (0, width, 0, height)
+        self.enabled = enabled
+        self.key = None
+        self.bounds = None
+
+    def unchanged(self, state):
+        return self.enabled and self.key == (*state.pos, state.angle, state.render_mode)
+
+    # Record the new frame and return the rect to redraw (None: nothing).
+    # Without points (bounds not known on the CPU) the whole frame is dirty.
+    def update(self, state, points=None):
+        first = self.key is None
+        bounds = self.full if points is None else screen_rect(points, self.width, self.height)
+        self.key = (*state.pos, state.angle, state.render_mode)
+        old, self.bounds = self.bounds, bounds
+
+        if first or not self.enabled or points is None:
+            return self.full
+        rects = [r for r in (old, bounds) if r]
+        if not rects:
+            return None
+
+        a = DIRTY_ALIGN
+        x0 = min(r[0] for r in rects) // a * a
+        y0 = min(r[2] for r in rects) // a * a
+        x1 = min(-(-max(r[1] for r in rects) // a) * a, self.width)
+        y1 = min(-(-max(r[3] for r in rects) // a) * a, self.height)
+        return x0, x1, y0, y1
+
+# ================= CULLING =================
+# Pre-raster stage shared by the software backends: it drops every triangle
+# that cannot draw a pixel before any per-triangle or per-pixel code sees it,
+# working on the whole transformed (N, 3, 3) array at once:
+#
+#   degenerate  zero area
+#   backface    wound the wrong way (with backface culling on)
+#   offscreen   bounds entirely outside the redraw rect
+#   clipped     reaching past the guard band; these are clipped to it
+#               rather than dropped
+#
+# Front faces wind clockwise on screen, edge(v0, v1, v2) < 0, like every
+# built-in shape and scene, and rotation never mirrors them.
+#
+# Triangles that merely cross the screen edge are left alone: the
+# rasterizers clip them to their bounding boxes for free. Only ones reaching
+# more than GUARD_BAND pixels off-screen are clipped geometrically, which
+# keeps coordinates and edge values bounded (at up to 1920 x 1080, 28.4
+# fixed-point edges of guard-band geometry fit in int32).
+GUARD_BAND = 256
+CULL_COUNTERS = ["submitted", "degenerate", "backface", "offscreen", "clipped"]
+
+# tris (N, 3, 3) screen space, attrs (N, 3, K) per-vertex attributes that
+# clipping interpolates. Returns the surviving triangles and attributes, in
+# submission order (a clipped triangle is replaced by its pieces in place),
+# the count per CULL_COUNTERS entry, and the indices of the surviving input
+# triangles, None if any were clipped. rect is the redraw rect, width x
+# height the screen the guard band surrounds.
+def cull_triangles(tris, attrs, rect, width=W, height=H, backface=True, guard=GUARD_BAND):
+    x0, x1, y0, y1 = rect
+    lo = tris[..., :2].min(axis=1)
+    hi = tris[..., :2].max(axis=1)
+    area = edge(tris[:, 0].T, tris[:, 1].T, tris[:, 2].T)
+
+    degenerate = area == 0
+    back = ~degenerate & (area > 0) if backface else np.zeros(len(tris), dtype=bool)
+    # one pixel of margin covers sub-pixel sample offsets and either
+    # sampling convention (pixel corners or centres)
+    offscreen = ((hi[:, 0] < x0 - 1) | (lo[:, 0] > x1 + 1) |
+                 (hi[:, 1] < y0 - 1) | (lo[:, 1] > y1 + 1)) & ~degenerate & ~back
+    keep = ~(degenerate | back | offscreen)
+
+    band = (-guard, width + guard, -guard, height + guard)
+    clip = keep & ((lo[:, 0] < band[0]) | (hi[:, 0] > band[1]) |
+                   (lo[:, 1] < band[2]) | (hi[:, 1] > band[3]))
+
+    counts = {
+        "submitted": len(tris),
+        "degenerate": int(degenerate.sum()),
+        "backface": int(back.sum()),
+        "offscreen": int(offscreen.sum()),
+        "clipped": int(clip.sum()),
+    }
+    if not clip.any():
+        if keep.all():
+            return tris, attrs, counts, np.arange(len(tris))
+        return tris[keep], attrs[keep], counts, np.flatnonzero(keep)
+
+    # the rare clipped triangles one by one, spliced back in order
+    kept = np.flatnonzero(keep)
+    out_tris, out_attrs = [], []
+    start = 0
+    for j in np.flatnonzero(clip[kept]):
+        i = kept[j]
+        out_tris.append(tris[kept[start:j]])
+        out_attrs.append(attrs[kept[start:j]])
+        pieces = clip_triangle(np.concatenate([tris[i], attrs[i]], axis=1), band)
+        out_tris.append(pieces[..., :3])
+        out_attrs.append(pieces[..., 3:])
+        start = j + 1
+    out_tris.append(tris[kept[start:]])
+    out_attrs.append(attrs[kept[start:]])
+    return np.concatenate(out_tris), np.concatenate(out_attrs), counts, None
+
+# Sutherland-Hodgman: clip one triangle of (3, 3 + K) vertex rows [x, y, z,
+# attributes...] to the rect (x0, x1, y0, y1), interpolating every column,
+# and fan the convex result back into (M, 3, 3 + K) triangles of the same
+# winding. M is 0 if nothing is left.
+def clip_triangle(verts, rect):
+    poly = list(verts)
+    for axis, bound, below in ((0, rect[0], False), (0, rect[1], True),
+                               (1, rect[2], False), (1, rect[3], True)):
+        out = []
+        for k, cur in enumerate(poly):
+            nxt = poly[(k + 1) % len(poly)]
+            cur_in = cur[axis] <= bound if below else cur[axis] >= bound
+            nxt_in = nxt[axis] <= bound if below else nxt[axis] >= bound
+            if cur_in:
+                out.append(cur)
+            if cur_in != nxt_in:
+                t = (bound - cur[axis]) / (nxt[axis] - cur[axis])
+                out.append(cur + t * (nxt - cur))
+        poly = out
+        if not poly:
+            return np.zeros((0, 3, verts.shape[1]))
+
+    return np.array([[poly[0], poly[k], poly[k + 1]] for k in range(1, len(poly) - 1)]
+                    ).reshape(-1, 3, verts.shape[1])
+
+# ================= SAMPLING =================
+# Sub-pixel sample offsets per sample count, in pixels from the pixel's
+# sample point: the standard D3D/GL multisample patterns. 4x is a rotated
+# grid, so near-horizontal and near-vertical edges get four distinct steps.
+SAMPLE_PATTERNS = {
+    1: [(0.0, 0.0)],
+    2: [(0.25, 0.25), (-0.25, -0.25)],
+    4: [(-0.125, -0.375), (0.375, -0.125), (-0.375, 0.125), (0.125, 0.375)],
+}
+
+# ================= FIXED POINT =================
+# With fixed_point the CPU backends rasterize the way GPUs do. Vertices are
+# snapped to 1/SUBPIXEL of a pixel (28.4 fixed point), pixels are sampled at
+# their centres, and edge functions are exact integers, affine in the pixel
+# position, so they are stepped with integer adds. A pixel exactly on an edge
+# belongs to the triangle only if that is a top or left edge (the top-left
+# rule), so triangles sharing an edge never both draw its pixels, and
+# coverage is bit-identical in every backend.
+#
+# Edge values are products of two 28.4 coordinates, which overflow 32 bits
+# at 4K, so they are int64 here; the batched NumPy path narrows them to int32
+# for frames where they fit.
+SUBPIXEL_BITS = 4
+SUBPIXEL = 1 << SUBPIXEL_BITS
+
+# (..., 3) or (..., 2) screen-space points to (..., 2) integer 28.4 positions.
+def snap(points):
+    return np.rint(points[..., :2] * SUBPIXEL).astype(np.int64)
+
+# Integer edge equations of snapped (N, 3, 2) triangles for the edges
+# (v1, v2), (v2, v0), (v0, v1): edge i at pixel (x, y) is
+#   e = dx[:, i] * x + dy[:, i] * y + c[:, i]
+# in 1/SUBPIXEL^2 pixel^2 units, scaled by the winding sign so "inside" is
+# e >= 0, and e / area are the barycentric weights. A pixel is covered where
+# e >= bias on all three edges: bias is 1 for edges that are not top-left, so
+# their pixels need e > 0. Degenerate triangles have area 0.
+def fixed_edges(p):
+    a = p[:, [1, 2, 0]]
+    b = p[:, [2, 0, 1]]
+    ex = b[..., 0] - a[..., 0]
+    ey = b[..., 1] - a[..., 1]
+    area = (p[:, 2, 0] - a[:, 2, 0]) * ey[:, 2] - (p[:, 2, 1] - a[:, 2, 1]) * ex[:, 2]
+    sign = np.where(area < 0, -1, 1)[:, None]
+    ex, ey = ex * sign, ey * sign
+
+    # e(P) = (P.x - a.x) * ey - (P.y - a.y) * ex at the centre
+    # P = (x, y) * SUBPIXEL + SUBPIXEL / 2
+    half = SUBPIXEL // 2
+    c = (half - a[..., 0]) * ey - (half - a[..., 1]) * ex
+    dx, dy = ey * SUBPIXEL, -ex * SUBPIXEL
+
+    # e grows into the triangle along +x on a left edge, and along +y on a
+    # horizontal top edge (Y down)
+    bias = np.where((dx > 0) | ((dx == 0) & (dy > 0)), 0, 1)
+    return dx, dy, c, bias, np.abs(area)
+
+# Pixel bounds (inclusive) of the centres a snapped (N, 3, 2) triangle can
+# cover, clipped to clip (x0, x1, y0, y1).
+def fixed_bounds(p, clip=FULL_FRAME):
+    cx0, cx1, cy0, cy1 = clip
+    half = SUBPIXEL // 2
+    lo = p.min(axis=1)
+    hi = p.max(axis=1)
+    minx = np.maximum(-((half - lo[:, 0]) // SUBPIXEL), cx0)
+    maxx = np.minimum((hi[:, 0] - half) // SUBPIXEL, cx1 - 1)
+    miny = np.maximum(-((half - lo[:, 1]) // SUBPIXEL), cy0)
+    maxy = np.minimum((hi[:, 1] - half) // SUBPIXEL, cy1 - 1)
+    return minx, maxx, miny, maxy
+
+# ================= GEOMETRY CACHE =================
+# Rotating the scene and setting up its triangles depend on the frame's
+# angle, not on where the scene is, so a frame that only moves it (the arrow
+# keys, a pan) reuses the rotation of an earlier frame and translates it.
+# Every renderer keeps an LRU of Geometry entries for its own scene, keyed
+# on the angle, evicting the least recently used past size entries (size 0
+# keeps nothing), and counts hits and misses.
+GEOMETRY_CACHE_SIZE = 16
+
+class GeometryCache:
+    def __init__(self, size=GEOMETRY_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # The entry for key, made by build() on a miss.
+    def get(self, key, build):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = build()
+        if self.size:
+            self.entries[key] = entry
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entry
+
+# One rotation of the scene (rotate_scene's output). Its fixed-point
+# triangle setup is built for the whole scene the first time a backend asks,
+# at that frame's position, and later frames translate it: with integer
+# edges e = dx * x + dy * y + c, moving every vertex by (tx, ty) subpixels
+# only changes c, by -(tx * dx + ty * dy) / SUBPIXEL, exactly. Snapping once
+# also keeps the snapped triangles rigid as they move.
+class Geometry:
+    def __init__(self, rotated, offsets):
+        self.rotated, self.offsets = rotated, offsets
+        self.fixed = None
+
+    # points (all of the scene's triangles in screen space, as placed by
+    # some frame with this rotation) seed the setup; tris are the triangles
+    # kept (indices into points' triangles) as placed now, maybe shifted by a
+    # sample offset. Returns Renderer.fixed_setup's tuple, or None if tris
+    # did not move by a whole number of subpixels.
+    def fixed_setup(self, points, tris, kept, clip):
+        if self.fixed is None:
+            ref = points.reshape(-1, 3, 3)
+            p = snap(ref)
+            self.fixed = (ref[:, 0, :2].copy(), p, *fixed_edges(p))
+        ref, p, dx, dy, c, bias, area = self.fixed
+
+        move = (tris[0, 0, :2] - ref[kept[0]]) * SUBPIXEL
+        t = np.rint(move)
+        if np.abs(move - t).max() > 1e-6:
+            return None
+        tx, ty = int(t[0]), int(t[1])
+
+        p = p[kept] + (tx, ty)
+        dx, dy = dx[kept], dy[kept]
+        c = c[kept] - (tx * dx + ty * dy) // SUBPIXEL
+        return p, dx, dy, c, bias[kept], area[kept], fixed_bounds(p, clip)
+
+# ================= RENDERERS =================
+# render(state) draws one frame and returns it as an (H, W, 3) uint8 array.
+# The array may be the renderer's own framebuffer, valid until the next call.
+# Work is timed in profiler stages (see profiler.STAGES); assign a Profiler
+# to collect them.
+#
+# After render(), damage is the rect that changed since the previous frame,
+# or None if the frame was reused as is. Backends that track changes redraw
+# only that rect; tracker.enabled = False forces full redraws.
+#
+# Every backend takes the output width x height, samples per pixel (a key
+# of SAMPLE_PATTERNS), fixed_point and cull_backfaces as constructor options.
+# fixed_point only changes the CPU backends; the GPU always rasterizes that
+# way.
+#
+# culled holds running totals per CULL_COUNTERS entry for backends that run
+# the cull stage. geometry_cache is the size of the GeometryCache behind
+# to_screen, whose hits and misses count for backends that transform on the
+# CPU.
+class Renderer:
+    name = None
+    profiler = NULL_PROFILER
+
+    def __init__(self, scene, width=W, height=H, samples=1, fixed_point=False,
+                 cull_backfaces=True, geometry_cache=GEOMETRY_CACHE_SIZE):
+        if samples not in SAMPLE_PATTERNS:
+            raise ValueError(f"unsupported sample count: {samples}")
+        self.scene = scene
+        self.width, self.height, self.samples = width, height, samples
+        self.fixed_point = fixed_point
+        self.cull_backfaces = cull_backfaces
+        self.culled = dict.fromkeys(CULL_COUNTERS, 0)
+        self.tracker = DamageTracker(width, height)
+        self.damage = (0, width, 0, height)
+
+        # this frame's cache entry, its points and the triangles cull kept
+        self.geometry_cache = GeometryCache(geometry_cache)
+        self.geometry = None
+        self.points = None
+        self.kept = None
+
+    def render(self, state):
+        raise NotImplementedError
+
+    # The scene's screen-space vertices at this renderer's resolution, from
+    # the geometry cache's rotation for state.angle.
+    def to_screen(self, state):
+        angle = state.angle
+        self.geometry = self.geometry_cache.get(
+            angle, lambda: Geometry(*rotate_scene(self.scene, angle))
+        )
+        self.points = viewport(place(self.geometry.rotated, self.geometry.offsets, state.pos),
+                               self.width, self.height)
+        self.kept = None
+        return self.points
+
+    # The cull stage for the software backends: the triangles of points
+    # (to_screen rows) that can draw inside rect, and each per-vertex
+    # attribute array (N * 3, K), or None, culled and clipped alike.
+    def cull(self, points, rect, *attrs):
+        with self.profiler.stage("cull"):
+            n = len(points)
+            packed = np.concatenate([a for a in attrs if a is not None] + [np.zeros((n, 0))],
+                                    axis=1)
+            tris, packed, counts, self.kept = cull_triangles(
+                points.reshape(-1, 3, 3), packed.reshape(n // 3, 3, -1), rect,
+                self.width, self.height, self.cull_backfaces
+            )
+            for key, count in counts.items():
+                self.culled[key] += count
+
+            packed = packed.reshape(-1, packed.shape[-1])
+            out, col = [], 0
+            for a in attrs:
+                if a is None:
+                    out.append(None)
+                    continue
+                out.append(packed[:, col:col + a.shape[1]])
+                col += a.shape[1]
+            return (tris.reshape(-1, 3), *out)
+
+    # Fixed-point setup of this frame's culled triangles tris (N, 3, 3): the
+    # snapped vertices, fixed_edges and fixed_bounds clipped to clip, as
+    # (p, dx, dy, c, bias, area, bounds). Translated from the geometry cache
+    # when none were clipped and they moved by whole subpixels.
+    def fixed_setup(self, tris, clip):
+        if self.geometry is not None and self.kept is not None and len(tris):
+            setup = self.geometry.fixed_setup(self.points, tris, self.kept, clip)
+            if setup is not None:
+                return setup
+        p = snap(tris)
+        return (p, *fixed_edges(p), fixed_bounds(p, clip))
+
+    # Supersampling for the software backends: draw(points) clears the
+    # dirty rect and rasterizes points into the framebuffer, and pixels is a
+    # view of the framebuffer memory covering that rect, in whatever layout
+    # the backend keeps. draw runs once per sample with the geometry shifted
+    # by that sample's offset, and the passes are averaged into pixels, so
+    # every sample gets its own coverage and depth test. With one sample it
+    # is a single plain pass.
+    def draw_samples(self, pixels, points, draw):
+        if self.samples == 1:
+            draw(points)
+            return
+
+        accum = np.zeros(pixels.shape, dtype=np.uint16)
+        for offset in SAMPLE_PATTERNS[self.samples]:
+            shifted = points.copy()
+            shifted[:, :2] -= offset
+            draw(shifted)
+            with self.profiler.stage("resolve"):
+                accum += pixels
+
+        with self.profiler.stage("resolve"):
+            n = self.samples
+            pixels[:] = (accum + n // 2) // n
+
+    # backend-specific counters for benchmarks, or None
+    def stats(self):
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+BACKENDS = {}
+
+# Raised by a backend constructor that cannot run on this machine, e.g. with
+# no OpenGL context; a missing optional module raises ImportError instead.
+class BackendUnavailable(RuntimeError):
+    pass
+
+# Modules that register the built-in backends when imported. New backends
+# either add themselves here or call register_backend from their own module.
+BACKEND_MODULES = {
+    "cpu": "cpu_renderer",
+    "multicore": "cpu_renderer_multicore",
+    "multicore-threads": "cpu_renderer_multicore",
+    "vectorized": "cpu_renderer_vectorized",
+    "vectorized-loop": "cpu_renderer_vectorized",
+    "numba": "cpu_renderer_numba",
+    "gpu": "gpu_renderer",
+}
+
+def register_backend(name):
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def get_backend(name):
+    if name not in BACKENDS and name in BACKEND_MODULES:
+        importlib.import_module(BACKEND_MODULES[name])
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend: {name}")
+    return BACKENDS[name]
+
+def create_renderer(name, scene, **options):
+    return get_backend(name)(scene, **options)
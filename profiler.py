@@ -0,0 +1,106 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Lightweight per-stage frame profiler. Backends and loops wrap their work in
+# profiler.stage(name), as often per frame as they like; end_frame() sums
+# each stage's time over the frame into one sample, so means, percentiles
+# and histograms are per frame the stage ran in, however many times it was
+# entered. Every entry is also kept as a raw event for the Chrome trace
+# (chrome://tracing / Perfetto); both export as JSON.
+#
+#   resolve   averaging supersampled passes into the framebuffer
+#   output    the frame as a row-major RGB array: the tiled framebuffer's
+#             swizzle on the CPU, the readback on the GPU
+#   blit      copying the frame and HUD to the window surface
+
+STAGES = ["events", "transform", "cull", "setup", "raster", "resolve", "output", "blit",
+          "present", "wait"]
+
+# histogram bucket edges in ms
+BUCKETS_MS = [0, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, float("inf")]
+
+class Profiler:
+    def __init__(self, max_events=200_000):
+        self.samples = defaultdict(list)  # per-frame seconds
+        self.calls = defaultdict(int)
+        self.pending = defaultdict(float)  # this frame's seconds so far
+        self.events = []
+        self.max_events = max_events
+        self.frame = 0
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            self.pending[name] += t1 - t0
+            self.calls[name] += 1
+            if len(self.events) < self.max_events:
+                self.events.append((name, t0, t1, self.frame))
+
+    def end_frame(self):
+        for name, seconds in self.pending.items():
+            self.samples[name].append(seconds)
+        self.pending.clear()
+        self.frame += 1
+
+    # ================= AGGREGATES =================
+    def summary(self):
+        names = [s for s in STAGES if s in self.samples] + \
+                [s for s in self.samples if s not in STAGES]
+        out = {}
+        for name in names:
+            ms = np.array(self.samples[name]) * 1000
+            counts, _ = np.histogram(ms, bins=BUCKETS_MS)
+            out[name] = {
+                "frames": len(ms),
+                "calls": self.calls[name],
+                "total_ms": float(ms.sum()),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "histogram": {f"<{edge}ms": int(c) for edge, c in zip(BUCKETS_MS[1:], counts)},
+            }
+        return out
+
+    # ================= EXPORT =================
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"frames": self.frame, "stages": self.summary()}, f, indent=2)
+
+    def to_chrome_trace(self, path, process_name="renderer"):
+        events = [{
+            "name": "process_name", "ph": "M", "pid": 1,
+            "args": {"name": process_name},
+        }]
+        for name, t0, t1, frame in self.events:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "pid": 1,
+                "tid": 1,
+                "ts": (t0 - self.origin) * 1e6,
+                "dur": (t1 - t0) * 1e6,
+                "args": {"frame": frame},
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+# Default for renderers nobody is profiling: stage() costs one call.
+class NullProfiler:
+    def stage(self, name):
+        return nullcontext()
+
+    def end_frame(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+
+from pipeline import W, H, Instances, get_shape
+
+# Procedural stress meshes for benchmarking. Every generator returns an
+# (N * 3, 2) float vertex array in the same local pixel space as get_shape()
+# (centred on the origin), so all backends move and rotate it with their
+# usual transform.
+#
+#   coverage   fraction of the W x H screen the scene's footprint spans
+#   overdraw   average number of triangles stacked on each footprint pixel
+#   size_spread  lognormal sigma of triangle sizes (0 = all the same size)
+#
+# "instances" scenes are the exception: count copies of one base shape with
+# per-instance transforms (see instance_scene).
+
+SCENE_KINDS = ["grid", "soup", "disc", "instances"]
+
+def footprint(coverage):
+    k = math.sqrt(coverage)
+    return W * k, H * k
+
+# ================= GENERATORS =================
+def grid_scene(count, coverage=0.5, overdraw=1.0):
+    fw, fh = footprint(coverage)
+    layers = max(1, round(overdraw))
+    cells = max(1, math.ceil(count / layers / 2))
+
+    cols = max(1, math.ceil(math.sqrt(cells * fw / fh)))
+    rows = math.ceil(cells / cols)
+    cw, ch = fw / cols, fh / rows
+
+    x = np.arange(cols) * cw - fw / 2
+    y = np.arange(rows) * ch - fh / 2
+    X, Y = [a.ravel() for a in np.meshgrid(x, y)]
+
+    # two triangles per cell, same winding as get_shape("square")
+    quad = np.array([
+        [0, 0], [cw, 0], [cw, ch],
+        [0, 0], [cw, ch], [0, ch]
+    ])
+    layer = (np.stack([X, Y], axis=1)[:, None, :] + quad[None]).reshape(-1, 2)
+
+    return np.tile(layer, (layers, 1))[:count * 3]
+
+def soup_scene(count, coverage=0.5, overdraw=1.0, size_spread=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    fw, fh = footprint(coverage)
+
+    # equilateral-ish triangles of circumradius r have area 3*sqrt(3)/4 * r^2;
+    # pick the mean r so total area is overdraw x the footprint
+    mean_area = overdraw * fw * fh / count
+    r_mean = math.sqrt(mean_area / (3 * math.sqrt(3) / 4))
+    r = r_mean * np.exp(size_spread * rng.standard_normal(count) - size_spread ** 2)
+
+    centres = rng.uniform([-fw / 2, -fh / 2], [fw / 2, fh / 2], (count, 2))
+    theta = rng.uniform(0, 2 * math.pi, (count, 1)) + \
+        np.array([0, 2 * math.pi / 3, 4 * math.pi / 3]) + \
+        rng.uniform(-0.3, 0.3, (count, 3))
+
+    tris = centres[:, None, :] + r[:, None, None] * np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+    return tris.reshape(-1, 2)
+
+def disc_scene(count, coverage=0.5, overdraw=1.0):
+    layers = max(1, round(overdraw))
+    per_layer = max(1, math.ceil(count / layers))
+    radius = math.sqrt(coverage * W * H / math.pi)
+    radius = min(radius, H / 2)
+
+    tris = []
+    for layer in range(layers):
+        # each layer is the same fan, rotated by half a wedge
+        t = (np.arange(per_layer + 1) + layer * 0.5) * 2 * math.pi / per_layer
+        rim = radius * np.stack([np.cos(t), np.sin(t)], axis=1)
+        fan = np.zeros((per_layer, 3, 2))
+        fan[:, 1] = rim[:-1]
+        fan[:, 2] = rim[1:]
+        tris.append(fan.reshape(-1, 2))
+
+    return np.concatenate(tris)[:count * 3]
+
+# ================= INSTANCES =================
+# count copies of a base shape at random positions, rotations and colour
+# tints, scaled so together they cover overdraw x the footprint. Returns the
+# scaled base mesh and its Instances.
+def instance_scene(count, shape="triangle", coverage=0.5, overdraw=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    fw, fh = footprint(coverage)
+
+    base = get_shape(shape)
+    tris = base.reshape(-1, 3, 2)
+    d1, d2 = tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]
+    area = np.abs(d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]).sum() / 2
+    scale = math.sqrt(overdraw * fw * fh / (count * area))
+
+    return base * scale, Instances(
+        pos=rng.uniform([-fw / 2, -fh / 2], [fw / 2, fh / 2], (count, 2)),
+        angle=rng.uniform(0, 2 * math.pi, count),
+        color=rng.uniform(0.25, 1.0, (count, 3))
+    )
+
+GENERATORS = {
+    "grid": grid_scene,
+    "soup": soup_scene,
+    "disc": disc_scene,
+}
+
+# ================= SPECS =================
+# Scenes are named like shapes so they can be passed anywhere a shape name
+# is accepted: "kind:count[,key=value...]", e.g. "soup:5000,overdraw=4".
+def is_scene_spec(name):
+    return name.split(":", 1)[0] in GENERATORS and ":" in name
+
+def is_instance_spec(name):
+    return name.startswith("instances:")
+
+def make_scene(kind, count, **options):
+    return GENERATORS[kind](count, **options)
+
+def parse_spec(spec):
+    kind, rest = spec.split(":", 1)
+    count, *pairs = rest.split(",")
+
+    options = {}
+    for pair in pairs:
+        key, value = pair.split("=")
+        if key == "shape":
+            options[key] = value
+        else:
+            options[key] = int(value) if key == "seed" else float(value)
+
+    return kind, int(count), options
+
+def parse_scene(spec):
+    kind, count, options = parse_spec(spec)
+    return make_scene(kind, count, **options)
+
+# "instances:count[,shape=square,...]" to (base mesh, Instances).
+def parse_instances(spec):
+    _, count, options = parse_spec(spec)
+    return instance_scene(count, **options)
+
+def scene_spec(kind, count, **options):
+    return ",".join([f"{kind}:{count}"] + [f"{k}={v}" for k, v in options.items()])
@@ -0,0 +1,108 @@
+import argparse
+import csv
+import json
+
+from benchmark import BACKEND_NAMES, bench_backend, make_script
+from pipeline import W, H, parse_resolution
+from scenes import SCENE_KINDS, scene_spec
+
+# Scaling sweep: runs every backend over generated scenes of growing size,
+# and optionally over output resolutions and sample counts, and writes the
+# curves as CSV and/or JSON, e.g.
+#   python sweep.py --kind soup --counts 1,100,10000 --csv sweep.csv
+#   python sweep.py --counts 1000 --resolutions 320x240,1920x1080,3840x2160 --samples 1,4
+
+DEFAULT_COUNTS = [1, 10, 100, 1000, 10000, 100000]
+
+FIELDS = [
+    "backend", "scene", "triangles", "width", "height", "samples", "frames",
+    "avg_ms", "p50_ms", "p95_ms", "p99_ms", "throughput_fps", "mtris_per_s", "mpix_per_s",
+    "skipped",
+]
+
+# Every backend runs every (count, resolution, samples) point, each
+# dimension in ascending order.
+def run_sweep(backends, kind, counts, frames=10, script_name="spin", budget_ms=1000.0,
+              warmup=1, resolutions=((W, H),), samples=(1,), **scene_options):
+    script = make_script(script_name, frames)
+    rows = []
+
+    for name in backends:
+        over_budget = []
+        for count in counts:
+            spec = scene_spec(kind, count, **scene_options)
+            for width, height in resolutions:
+                for n in samples:
+                    point = (count, width * height, n)
+                    row = {"backend": name, "scene": spec, "triangles": count,
+                           "width": width, "height": height, "samples": n}
+
+                    # once a backend is too slow at some point, points at least
+                    # as large in every dimension only get slower
+                    if any(all(a >= b for a, b in zip(point, slow)) for slow in over_budget):
+                        row["skipped"] = "over budget"
+                        rows.append(row)
+                        continue
+
+                    # full redraws: the curve is raster cost, not how much of it was skipped
+                    result = bench_backend(name, spec, script, warmup, full_redraw=True,
+                                           width=width, height=height, samples=n)
+                    result.pop("stats", None)
+                    result.pop("checksum", None)
+                    result.pop("options", None)
+                    result.pop("redrawn", None)
+                    row.update(result)
+
+                    if "skipped" not in result:
+                        row["mtris_per_s"] = count * result["throughput_fps"] / 1e6
+                        row["mpix_per_s"] = width * height * result["throughput_fps"] / 1e6
+                        if result["p50_ms"] > budget_ms:
+                            over_budget.append(point)
+
+                    rows.append(row)
+                    print(f"{name:<16}{count:>8} tris {width:>5}x{height:<5}{n}x  " +
+                          (f"{row['p50_ms']:>10.2f} ms" if "p50_ms" in row else row["skipped"]))
+
+    return rows
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: row.get(k, "") for k in FIELDS})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triangle-count scaling sweep")
+    parser.add_argument("--backends", default=",".join(BACKEND_NAMES))
+    parser.add_argument("--kind", default="soup", choices=SCENE_KINDS)
+    parser.add_argument("--counts", default=",".join(map(str, DEFAULT_COUNTS)))
+    parser.add_argument("--coverage", type=float, default=0.5)
+    parser.add_argument("--overdraw", type=float, default=1.0)
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--script", default="spin")
+    parser.add_argument("--budget-ms", type=float, default=1000.0,
+                        help="stop growing a backend's scene once its p50 exceeds this")
+    parser.add_argument("--resolutions", default=f"{W}x{H}",
+                        help="comma-separated output sizes, e.g. 320x240,1920x1080,3840x2160")
+    parser.add_argument("--samples", default="1", help="comma-separated samples per pixel, e.g. 1,2,4")
+    parser.add_argument("--csv", help="write the curve to this CSV file")
+    parser.add_argument("--json", help="write the curve to this JSON file")
+    args = parser.parse_args(argv)
+
+    rows = run_sweep(
+        args.backends.split(","), args.kind, [int(c) for c in args.counts.split(",")],
+        frames=args.frames, script_name=args.script, budget_ms=args.budget_ms,
+        resolutions=[parse_resolution(r) for r in args.resolutions.split(",")],
+        samples=[int(n) for n in args.samples.split(",")],
+        coverage=args.coverage, overdraw=args.overdraw
+    )
+
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
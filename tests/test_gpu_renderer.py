@@ -0,0 +1,44 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from pipeline import BackendUnavailable, Instances, initial_state, load_scene
+
+def gpu_renderer(scene, **options):
+    try:
+        from gpu_renderer import GPURenderer
+        return GPURenderer(scene, width=160, height=120, **options)
+    except (ImportError, BackendUnavailable) as e:
+        pytest.skip(f"gpu backend unavailable: {e}")
+
+def take(instances, n):
+    return Instances(instances.pos[:n], instances.angle[:n], instances.color[:n])
+
+# A streaming renderer draws however many instances the scene has this
+# frame, growing and shrinking its instance buffer to match.
+def test_stream_follows_instance_count():
+    scene = load_scene("instances:16")
+    every = scene.instances
+    state = initial_state()
+
+    streaming = gpu_renderer(scene, stream=True)
+    try:
+        for n in (4, 16, 1):
+            scene.instances = take(every, n)
+            state.angle += 0.1
+            frame = np.array(streaming.render(state))
+            assert streaming.instances == n
+
+            # a non-streaming renderer uploads its instances once, up front
+            fixed = gpu_renderer(replace(scene))
+            try:
+                assert np.array_equal(frame, fixed.render(state))
+            finally:
+                fixed.close()
+    finally:
+        streaming.close()
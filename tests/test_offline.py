@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Raw frames on stdout must be exactly the frames: nothing else (such as
+# pygame's import banner) may be written there.
+def test_raw_stdout_is_only_frames():
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy")
+    env.pop("PYGAME_HIDE_SUPPORT_PROMPT", None)
+    frames, width, height = 3, 64, 48
+
+    proc = subprocess.run(
+        [sys.executable, "offline.py", "--backend", "cpu", "--format", "raw",
+         "--frames", str(frames), "--resolution", f"{width}x{height}"],
+        cwd=ROOT, env=env, capture_output=True, check=True
+    )
+    assert len(proc.stdout) == frames * width * height * 3
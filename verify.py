@@ -0,0 +1,201 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from benchmark import BACKEND_NAMES, make_script
+from pipeline import (
+    W, H, BG, BackendUnavailable, create_renderer, initial_state, load_scene, parse_resolution
+)
+
+# Cross-backend correctness check: renders the same scripted frames on every
+# backend and diffs them against a reference backend, e.g.
+#   python verify.py --shape square --reference cpu --out verify_out
+#
+# Mismatches near a colour discontinuity (silhouettes, shared triangle
+# edges) are forgiven up to --edge-tol pixels away, since backends may
+# legitimately disagree there (corner vs centre sampling, fill rules).
+# The exit status is non-zero if any backend has unforgiven mismatches or
+# fails while rendering. Only backends that cannot run here at all (a
+# missing optional module, no OpenGL context) are skipped.
+#
+# The gpu backend is not in the default list. The float CPU paths sample
+# pixel corners and the GPU samples centres, so in float mode it misses on
+# thousands of interior pixels. With --fixed-point both sample centres, and
+# only a few pixels remain, where the GPU's own subpixel precision decides a
+# tie differently. Check it explicitly with a budget for those:
+#   python verify.py --backends gpu --fixed-point --max-failing 16
+DEFAULT_BACKENDS = [name for name in BACKEND_NAMES if name != "gpu"]
+
+# ================= RENDERING =================
+def render_frames(renderer, script):
+    frames = []
+    with renderer:
+        state = initial_state()
+        for dx, dy, dangle in script:
+            state.pos[0] += dx
+            state.pos[1] += dy
+            state.angle += dangle
+            frames.append(np.array(renderer.render(state)))
+    return frames
+
+# ================= DIFFING =================
+def dilate(mask, radius):
+    out = mask.copy()
+    for _ in range(radius):
+        grown = out.copy()
+        grown[1:] |= out[:-1]
+        grown[:-1] |= out[1:]
+        grown[:, 1:] |= out[:, :-1]
+        grown[:, :-1] |= out[:, 1:]
+        out = grown
+    return out
+
+# Pixels that differ from a 4-neighbour by more than `contrast` on any channel.
+def discontinuities(frame, contrast):
+    f = frame.astype(np.int16)
+    out = np.zeros(frame.shape[:2], dtype=bool)
+    dy = np.abs(f[1:] - f[:-1]).max(axis=2) > contrast
+    dx = np.abs(f[:, 1:] - f[:, :-1]).max(axis=2) > contrast
+    out[1:] |= dy
+    out[:-1] |= dy
+    out[:, 1:] |= dx
+    out[:, :-1] |= dx
+    return out
+
+def coverage(frame):
+    return (frame != BG).any(axis=2)
+
+def compare(ref, frame, channel_tol=2, edge_tol=1, contrast=32, coverage_only=False):
+    if coverage_only:
+        mismatch = coverage(ref) != coverage(frame)
+        diff = mismatch.astype(np.uint8) * 255
+    else:
+        diff = np.abs(ref.astype(np.int16) - frame).max(axis=2)
+        mismatch = diff > channel_tol
+
+    band = dilate(discontinuities(ref, contrast) | discontinuities(frame, contrast), edge_tol)
+    failing = mismatch & ~band
+
+    return {
+        "mismatched": int(mismatch.sum()),
+        "edge_forgiven": int((mismatch & band).sum()),
+        "failing": int(failing.sum()),
+        "coverage_mismatch": int((coverage(ref) != coverage(frame)).sum()),
+        "max_diff": int(diff.max()),
+        "mismatch_mask": mismatch,
+        "failing_mask": failing,
+    }
+
+# Reference dimmed to grey, forgiven edge mismatches yellow, failures red.
+def diff_image(ref, result):
+    img = (ref.mean(axis=2, keepdims=True) * 0.4).astype(np.uint8).repeat(3, axis=2)
+    img[result["mismatch_mask"]] = (255, 255, 0)
+    img[result["failing_mask"]] = (255, 0, 0)
+    return img
+
+def save_image(path, frame):
+    import pygame
+    h, w = frame.shape[:2]
+    pygame.image.save(pygame.image.frombuffer(np.ascontiguousarray(frame), (w, h), "RGB"), path)
+
+# ================= VERIFY =================
+def verify(shape_name, script, reference="cpu", backends=DEFAULT_BACKENDS, out=None,
+           max_failing=0, render_options=None, **compare_options):
+    render_options = render_options or {}
+    ref_frames = render_frames(
+        create_renderer(reference, load_scene(shape_name), **render_options), script
+    )
+    reports = []
+
+    for name in backends:
+        if name == reference:
+            continue
+
+        try:
+            renderer = create_renderer(name, load_scene(shape_name), **render_options)
+        except (ImportError, BackendUnavailable) as e:
+            reports.append({"backend": name, "skipped": f"{type(e).__name__}: {e}"})
+            continue
+
+        try:
+            frames = render_frames(renderer, script)
+        except Exception as e:
+            reports.append({"backend": name, "error": f"{type(e).__name__}: {e}",
+                            "passed": False})
+            continue
+
+        report = {"backend": name, "frames": len(frames), "mismatched": 0,
+                  "edge_forgiven": 0, "failing": 0, "coverage_mismatch": 0, "max_diff": 0}
+
+        for i, (ref, frame) in enumerate(zip(ref_frames, frames)):
+            result = compare(ref, frame, **compare_options)
+            for key in ("mismatched", "edge_forgiven", "failing", "coverage_mismatch"):
+                report[key] += result[key]
+            report["max_diff"] = max(report["max_diff"], result["max_diff"])
+
+            if out and result["mismatched"]:
+                os.makedirs(out, exist_ok=True)
+                save_image(os.path.join(out, f"{name}_{i:04d}_diff.png"), diff_image(ref, result))
+                save_image(os.path.join(out, f"{name}_{i:04d}.png"), frame)
+
+        report["passed"] = report["failing"] <= max_failing
+        reports.append(report)
+
+    return reports
+
+def print_reports(reference, reports):
+    print(f"reference: {reference}")
+    print(f"{'backend':<16}{'mismatch':>10}{'forgiven':>10}{'failing':>10}{'coverage':>10}{'max diff':>10}  result")
+    for r in reports:
+        if "skipped" in r:
+            print(f"{r['backend']:<16}skipped ({r['skipped']})")
+            continue
+        if "error" in r:
+            print(f"{r['backend']:<16}error ({r['error']})  FAIL")
+            continue
+        print(f"{r['backend']:<16}{r['mismatched']:>10}{r['edge_forgiven']:>10}{r['failing']:>10}"
+              f"{r['coverage_mismatch']:>10}{r['max_diff']:>10}  {'PASS' if r['passed'] else 'FAIL'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-backend pixel correctness check")
+    parser.add_argument("--shape", default="square")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--script", default="orbit", choices=["static", "spin", "orbit", "keys"])
+    parser.add_argument("--reference", default="cpu")
+    parser.add_argument("--backends", default=",".join(DEFAULT_BACKENDS),
+                        help=f"comma-separated, any of {','.join(BACKEND_NAMES)}")
+    parser.add_argument("--channel-tol", type=int, default=2,
+                        help="per-channel difference still counted as a match")
+    parser.add_argument("--edge-tol", type=int, default=1,
+                        help="forgive mismatches within this many pixels of an edge")
+    parser.add_argument("--contrast", type=int, default=32,
+                        help="neighbour difference that marks a pixel as an edge")
+    parser.add_argument("--coverage-only", action="store_true",
+                        help="compare which pixels are covered, not their colour")
+    parser.add_argument("--max-failing", type=int, default=0,
+                        help="unforgiven mismatching pixels allowed per backend")
+    parser.add_argument("--out", help="directory for diff images of mismatching frames")
+    parser.add_argument("--resolution", default=f"{W}x{H}", help="output size, e.g. 1920x1080")
+    parser.add_argument("--samples", type=int, default=1, help="samples per pixel: 1, 2 or 4")
+    parser.add_argument("--fixed-point", action="store_true",
+                        help="rasterize in 28.4 fixed point with the top-left rule (CPU backends)")
+    args = parser.parse_args(argv)
+    width, height = parse_resolution(args.resolution)
+
+    reports = verify(
+        args.shape, make_script(args.script, args.frames),
+        reference=args.reference, backends=args.backends.split(","), out=args.out,
+        max_failing=args.max_failing, channel_tol=args.channel_tol, edge_tol=args.edge_tol,
+        contrast=args.contrast, coverage_only=args.coverage_only,
+        render_options={"width": width, "height": height, "samples": args.samples,
+                        "fixed_point": args.fixed_point}
+    )
+    print_reports(args.reference, reports)
+
+    if not all(r.get("passed", True) for r in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()